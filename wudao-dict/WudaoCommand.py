@@ -1,38 +1,72 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-import json
 import sys
 import os
-import socket
-
 
+# Only what every run needs is imported here. The client (socket) and the
+# dictionary reader (mmap, zlib) are imported when a query uses them,
+# see check_startup.py for the budget.
 from src.CommandDraw import CommandDraw
 from src.UserHistory import UserHistory
-from src.WudaoClient import WudaoClient
 from src.tools import is_alphabet
-from src.tools import ie
 
 
 class WudaoCommand:
+    # interaction mode
+    INPUT_HISTORY_NAME = './usr/input_history'
+    INPUT_HISTORY_LEN = 1000
+    SESSION_CACHE_LEN = 256
+    COMPLETE_LIMIT = 50
+
     def __init__(self):
         # Member
         self.word = ''
         self.param_list = []
+        # batch mode: file of words, '-' for stdin
+        self.batch_file = None
+        # --format: records for scripts instead of terminal text, see src/RecordWriter.py
+        self.format = None
+        # --export-notebook: anki or csv, see src/export.py
+        self.export_format = None
         # Init
         self.param_separate()
-        self.painter = CommandDraw()
+        self.painter = CommandDraw('NO_COLOR' not in os.environ)
         self.history_manager = UserHistory()
         self.conf = self.history_manager.conf
-        # client
-        self.client = WudaoClient()
+        # client, connected on first use
+        self.__client = None
+        # dictionary opened in-process, see query_local
+        self.reader = None
+        # bloom filter of the dictionary words, see maybe_word; False when there is none
+        self.known_words = None
+        # (word, short) -> rendered, only in interaction mode
+        self.session_cache = None
+
+    @property
+    def client(self):
+        if self.__client is None:
+            from src.WudaoClient import WudaoClient
+            self.__client = WudaoClient()
+        return self.__client
 
     # init parameters
     def param_separate(self):
         if len(sys.argv) == 1:
             self.param_list.append('h')
         else:
-            for v in sys.argv[1:]:
-                if v.startswith('-'):
+            args = iter(sys.argv[1:])
+            for v in args:
+                if v == '-':
+                    self.batch_file = v
+                elif v in ('-f', '--file'):
+                    self.batch_file = next(args, '')
+                elif v == '--export-notebook':
+                    self.param_list.append(v)
+                    self.export_format = next(args, '')
+                elif v == '--format' or v.startswith('--format='):
+                    self.param_list.append('--format')
+                    self.format = v[len('--format='):] if '=' in v else next(args, '')
+                elif v.startswith('-'):
                     self.param_list.append(v)
                 else:
                     self.word += ' ' + v
@@ -40,7 +74,7 @@ class WudaoCommand:
 
     # process parameters
     def param_parse(self):
-        if len(self.param_list) == 0:
+        if len(self.param_list) == 0 and self.batch_file is None:
             return
         # help
         if '-h' in self.param_list or '--help' in self.param_list:
@@ -52,8 +86,12 @@ class WudaoCommand:
             print('-i, --inter            interaction mode              (交互模式)')
             print('-n, --note             save/not save to notebook     (保存/不保存到生词本)')
             print('-v, --version          version info                  (版本信息)')
-            print('生词本文件: ' + os.path.abspath('./usr/') + '/notebook.txt')
-            print('查询次数: ' + os.path.abspath('./usr/') + '/usr_word.json')
+            print('-f, --file FILE        words of FILE, one per line   (批量查询, - 读取标准输入)')
+            print('    --format FORMAT    json, jsonl or tsv records    (输出给脚本处理的格式)')
+            print('    --export-notebook anki|csv [NOTEBOOK]            (导出生词本)')
+            print('    --stdio            JSON-RPC on stdin/stdout      (编辑器插件用)')
+            print('生词本文件: ' + os.path.abspath(self.user_dir()) + '/notebook.txt')
+            print('查询次数: ' + os.path.abspath(self.user_dir()) + '/usr_word.json')
             #print('-o, --online-search          search word online')
             exit(0)
         # interaction mode
@@ -62,11 +100,12 @@ class WudaoCommand:
             print(':help                    本帮助')
             print(':note [filename]         设置生词本的名称')
             print(':long                    切换完整模式(:short切换回去)')
+            print('Tab                      补全单词')
             self.interaction()
             sys.exit(0)
         # close server
         if '-k' in self.param_list or '--kill' in self.param_list:
-            self.client.close()
+            self.client.shutdown_server()
             sys.exit(0)
         # version
         if '-v' in self.param_list or '--version' in self.param_list:
@@ -86,6 +125,14 @@ class WudaoCommand:
             else:
                 print('保存到生词本关闭。再次键入 wd -n 开启')
         self.history_manager.save_conf(self.conf)
+        # notebook export
+        if self.export_format is not None:
+            self.export_notebook(self.export_format, self.word or 'notebook')
+            sys.exit(0)
+        # batch mode
+        if self.batch_file is not None:
+            self.batch(self.batch_file)
+            sys.exit(0)
         # word check
         if not self.word:
             print('Usage: wd [OPTION]... [WORD]')
@@ -93,72 +140,358 @@ class WudaoCommand:
 
     # query word
     def query(self, word, notename='notebook'):
-        word_info = {}
+        from src.protocol import ServerError
+        # interaction mode: a word looked up before in this session is shown again as it was
+        key = (word, self.conf['short'])
+        rendered = None
+        if self.session_cache is not None:
+            rendered = self.session_cache.get(key)
+        if rendered is None:
+            try:
+                rendered = self.lookup(word, notename)
+            except ServerError as e:
+                print(e)
+                return
+            if rendered is None:
+                print('No such word: %s found online' % (self.painter.RED_PATTERN % word))
+                return
+            if self.session_cache is not None:
+                self.session_cache.put(key, rendered)
+        self.draw(rendered[1])
+
+    # (meta, rendered text) or None, raises ServerError for errors of the online search
+    def lookup(self, word, notename='notebook'):
         is_zh = False
         if word:
             if not is_alphabet(word[0]):
                 is_zh = True
-        # 1. query on server
-        word_info = None
-        server_context = self.client.get_word_info(word).strip()
-        if server_context and server_context != 'None':
-            word_info = json.loads(server_context)
-        # 2. search in online cache first
-        if not word_info:
-            word_info = self.history_manager.get_word_info(word)
-        # 3. online search
-        if not word_info:
+        track = None
+        if not is_zh:
+            track = {'note': notename if self.conf['save'] else None}
+        # 1. WUDAO_DIRECT=1: only the dictionary files, read in-process
+        if os.environ.get('WUDAO_DIRECT') == '1':
+            return self.lookup_local(word, is_zh, track)
+        # 2. query on server when one answers: dictionary, then its online cache, then online
+        #    search. It replies with the rendered text (cached per word and mode), and keeps the
+        #    history and notebook of users it can tell apart, so they stay in one place.
+        #    With the binary indexes a server that is not up is not waited for.
+        from src.protocol import ServerUnavailable
+        try:
+            self.client.ensure_connected(wait=0 if self.use_direct() else None)
+            rendered = self.client.get_word_rendered(word, self.conf['short'], self.painter.color,
+                                                     online=True, track=track)
+        except ServerUnavailable as e:
+            # 3. read the dictionary ourselves, there is no online search then
+            if not self.use_direct():
+                print(e, file=sys.stderr)
+            return self.lookup_local(word, is_zh, track)
+        if rendered is not None and track is not None and not rendered[0].pop('tracked', False):
+            self.track_local(rendered[0], track)
+        return rendered
+
+    # (meta, rendered text) from the dictionary files, history and notebook written to ./usr
+    def lookup_local(self, word, is_zh, track=None):
+        rendered = self.query_local(word, is_zh)
+        if rendered is not None and track is not None:
+            self.track_local(rendered[0], track)
+        return rendered
+
+    def track_local(self, meta, track):
+        if track.get('note'):
+            self.history_manager.save_note(meta, track['note'])
+        self.history_manager.add_item(meta)
+
+    # directory of this user's history and notebooks: the one a shared server keeps for
+    # a token or a uid other than its owner's (see src/UserSpace.py), if there is one
+    def user_dir(self):
+        names = [str(os.getuid())] if hasattr(os, 'getuid') else []
+        token = os.environ.get('WUDAO_TOKEN')
+        if token:
+            import json
             try:
-                # online search
-                from src.WudaoOnline import get_text, get_zh_text
-                from urllib.error import URLError
-                import bs4
-                import lxml
-                print('Word not found locally, searching online...') # Inform user
-                if is_zh:
-                    word_info = get_zh_text(word)
-                else:
-                    word_info = get_text(word)
-                
-                # Check if online search actually returned something valid
-                if not word_info or not word_info.get('paraphrase'):
-                    print('No such word: %s found online' % (self.painter.RED_PATTERN % word))
-                    return # Exit if online search fails
-                # store struct only if found online and valid
-                self.history_manager.add_word_info(word_info)
-            except ImportError:
-                # print('Word not found, auto Online search...') # Redundant with the print above
-                print('Error: Dependencies missing for online search.')
-                print('Please install bs4 and lxml first.')
-                print('Use ' + self.painter.RED_PATTERN % 'sudo pip3 install bs4 lxml' + ' or get them online.')
-                return
-            except URLError as e:
-                # print('Word not found, auto Online search...') # Redundant
-                print(f'Error: Network issue during online search ({e}). Please check your connection.')
-                return
-            except socket.timeout:
-                # print('Word not found, auto Online search...') # Redundant
-                print('Error: Online search timed out. Please check your connection or try again later.')
-                return
-            except Exception as e: # Catch other potential errors during online search
-                print(f"Error during online search: {e}")
-                return
-        # 4. save note
-        if self.conf['save'] and not is_zh:
-            self.history_manager.save_note(word_info, notename)
-        # 5. draw
-        if word_info:
-            if is_zh:
-                self.painter.draw_zh_text(word_info, self.conf)
-            else:
-                self.painter.draw_text(word_info, self.conf)
-                self.history_manager.add_item(word_info)
+                with open('./usr/tokens.json', 'r') as f:
+                    names.insert(0, str(json.load(f)[token]))
+            except (OSError, ValueError, KeyError, TypeError):
+                pass
+        for name in names:
+            path = os.path.join(self.history_manager.USR_DIR, 'users', name)
+            if os.path.isdir(path):
+                return path
+        return self.history_manager.USR_DIR
+
+    # look up every line of `file_name` ('-' for stdin), answers stream out in input order.
+    # Offline only and not added to the history, so a long list stays fast.
+    def batch(self, file_name):
+        if file_name == '-':
+            f = sys.stdin
+        else:
+            try:
+                f = open(file_name, 'r', encoding='utf-8')
+            except OSError as e:
+                print('Cannot read %s: %s' % (file_name, e.strerror), file=sys.stderr)
+                sys.exit(1)
+        words = (line.strip() for line in f if line.strip())
+        if self.format:
+            writer = self.get_record_writer()
+            results = self.batch_results(words, lambda word: self.query_local_dict(word, writer.fields),
+                                         lambda words: self.client.get_words_dict(words, fields=writer.fields))
+            self.output(results, writer.write, writer.close)
+        else:
+            short, color = self.conf['short'], self.painter.color
+            results = self.batch_results(words, lambda word: self.query_local(word, not is_alphabet(word[0])),
+                                         lambda words: self.client.get_words_rendered(words, short, color))
+            self.output(results, self.show)
+
+    # (word, result) for each of `words`: local(word) in-process, or remote(words) on one
+    # server connection with the requests pipelined
+    def batch_results(self, words, local, remote):
+        from src.protocol import ServerUnavailable
+        if not self.use_direct():
+            try:
+                self.client.connect()
+                return self.screened_results(words, remote)
+            except ServerUnavailable as e:
+                print(e, file=sys.stderr)
+        return ((word, local(word)) for word in words)
+
+    # remote(words) without sending the words the dictionary certainly does not have,
+    # their result is None; still in input order
+    def screened_results(self, words, remote):
+        from collections import deque
+        # (word, sent) of the words read so far, appended by the sending side of remote()
+        pending = deque()
+
+        def sent_words():
+            for word in words:
+                sent = self.maybe_word(word)
+                pending.append((word, sent))
+                if sent:
+                    yield word
+
+        for word, result in remote(sent_words()):
+            while True:
+                skipped, sent = pending.popleft()
+                if sent:
+                    break
+                yield skipped, None
+            yield word, result
+        while pending:
+            yield pending.popleft()[0], None
+
+    # show(word, result) for each of `results`, then done()
+    def output(self, results, show, done=None):
+        while True:
+            try:
+                word, result = next(results)
+            except StopIteration:
+                break
+            except ConnectionError:
+                print('Error: lost the connection to the Wudao server', file=sys.stderr)
+                sys.exit(1)
+            try:
+                show(word, result)
+            except BrokenPipeError:
+                self.stdout_closed()
+        try:
+            if done is not None:
+                done()
+        except BrokenPipeError:
+            self.stdout_closed()
+
+    # reader went away (wd -f words | head), no error at exit either
+    def stdout_closed(self):
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+
+    def show(self, word, rendered):
+        if rendered is None:
+            print('No such word: %s' % (self.painter.RED_PATTERN % word))
         else:
-            print('Word not exists.')
+            self.draw(rendered[1])
+
+    def get_record_writer(self):
+        from src.RecordWriter import RecordWriter
+        try:
+            return RecordWriter(self.format, sys.stdout)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            sys.exit(1)
+
+    # --format for one word: dictionary, then the server's online search like query()
+    def query_records(self, word):
+        from src.protocol import ServerError
+        from src.protocol import ServerUnavailable
+        writer = self.get_record_writer()
+        entry = None
+        if self.use_direct():
+            entry = self.query_local_dict(word, writer.fields)
+        if entry is None:
+            try:
+                entry = self.client.get_word_dict(word, fields=writer.fields, online=True)
+            except ServerError as e:
+                print(e, file=sys.stderr)
+            except ServerUnavailable as e:
+                print(e, file=sys.stderr)
+                entry = self.query_local_dict(word, writer.fields)
+        self.output(iter([(word, entry)]), writer.write, writer.close)
+
+    # write a notebook (name in usr/ or a file) as anki or csv next to it, or in $HOME
+    # if this user does not own that directory (a shared server's usr/users/<uid>/)
+    def export_notebook(self, fmt, notebook):
+        from src.export import export_notebook
+        file_name = notebook
+        if not os.path.isfile(file_name):
+            file_name = os.path.join(self.user_dir(), notebook + '.txt')
+        out_name = os.path.splitext(file_name)[0] + ('.anki.txt' if fmt == 'anki' else '.csv')
+        out_dir = os.path.dirname(os.path.abspath(out_name))
+        if hasattr(os, 'getuid') and not (os.stat(out_dir).st_uid == os.getuid() and os.access(out_dir, os.W_OK)):
+            out_name = os.path.join(os.path.expanduser('~'), os.path.basename(out_name))
+        try:
+            count, found = export_notebook(self.get_reader(), file_name, fmt, out_name)
+        except OSError as e:
+            print('Cannot export %s: %s' % (e.filename or file_name, e.strerror), file=sys.stderr)
+            sys.exit(1)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            sys.exit(1)
+        print('%d words (%d found in the dictionary) exported to %s' % (count, found, os.path.abspath(out_name)))
+
+    # write rendered terminal text
+    def draw(self, text):
+        sys.stdout.flush()
+        sys.stdout.buffer.write(text)
+        sys.stdout.buffer.flush()
+
+    # True if the dictionary may be read in-process instead of waiting for a server that is
+    # not up: WUDAO_DIRECT=1 always (and lookup() then never asks a server), 0 never; by
+    # default when the binary indexes make opening the dictionary cheap
+    def use_direct(self):
+        direct = os.environ.get('WUDAO_DIRECT')
+        if direct is not None:
+            return direct == '1'
+        from src.JsonReader import JsonReader
+        return JsonReader.has_bin_index('./dict/en.ind', './dict/en.idx') and \
+            JsonReader.has_bin_index('./dict/zh.ind', './dict/zh.idx')
     
+    # dictionary opened in-process, on first use
+    def get_reader(self):
+        from src.JsonReader import JsonReader
+        if self.reader is None:
+            self.reader = JsonReader()
+        return self.reader
+
+    # False when `word` is certainly not in the dictionary, then it does not need to be opened
+    # or asked for it; True when it may be, or there is no up-to-date dict/words.bloom
+    def maybe_word(self, word):
+        if self.known_words is None:
+            from src.JsonReader import JsonReader
+            from src.BloomFilter import BloomFilter, FILE_NAME
+            self.known_words = False
+            if JsonReader.has_bin_index('./dict/en.ind', FILE_NAME) and \
+                    JsonReader.has_bin_index('./dict/zh.ind', FILE_NAME):
+                try:
+                    self.known_words = BloomFilter(FILE_NAME)
+                except (OSError, ValueError):
+                    pass
+        if self.known_words is False or not word:
+            return True
+        return (word.lower() if is_alphabet(word[0]) else word) in self.known_words
+
+    # word info dict (only `fields` if given) from the dictionary files, or None
+    def query_local_dict(self, word, fields=None):
+        if not self.maybe_word(word):
+            return None
+        if not is_alphabet(word[0]):
+            return self.get_reader().get_zh_word_dict(word, fields)
+        return self.get_reader().get_word_dict(word.lower(), fields)
+
+    # (meta, rendered text) from the dictionary files
+    def query_local(self, word, is_zh):
+        from src.JsonReader import EN_SHORT_FIELDS, ZH_SHORT_FIELDS
+        fields = None
+        if self.conf['short']:
+            fields = ZH_SHORT_FIELDS if is_zh else EN_SHORT_FIELDS
+        word_info = self.query_local_dict(word, fields)
+        if word_info is None:
+            return None
+        if is_zh:
+            text = self.painter.render_zh_text(word_info, self.conf)
+        else:
+            text = self.painter.render_text(word_info, self.conf)
+        meta = {'word': word_info['word'], 'pronunciation': word_info['pronunciation'],
+                'paraphrase': word_info['paraphrase']}
+        return meta, text.encode('utf-8')
+
     # interaction mode
     def interaction(self):
+        from src.protocol import ServerUnavailable
+        from src.tools import LRUCache
         self.conf = {'save': True, 'short': True, 'notename': 'notebook'}
+        self.session_cache = LRUCache(self.SESSION_CACHE_LEN)
+        # the connection is kept for the whole session, open it before the first word
+        if not self.use_direct():
+            try:
+                self.client.connect()
+            except ServerUnavailable as e:
+                print(e, file=sys.stderr)
+        readline = self.setup_readline()
+        try:
+            self.interaction_loop()
+        finally:
+            if readline is not None:
+                try:
+                    readline.write_history_file(self.INPUT_HISTORY_NAME)
+                except OSError:
+                    pass
+
+    # input history and Tab completion, None if there is no readline module
+    def setup_readline(self):
+        try:
+            import readline
+        except ImportError:
+            return None
+        try:
+            readline.read_history_file(self.INPUT_HISTORY_NAME)
+        except OSError:
+            pass
+        readline.set_history_length(self.INPUT_HISTORY_LEN)
+        # the whole line is completed, phrases have spaces in them
+        readline.set_completer_delims('')
+        readline.set_completer(self.complete)
+        if 'libedit' in (readline.__doc__ or ''):
+            readline.parse_and_bind('bind ^I rl_complete')
+        else:
+            readline.parse_and_bind('tab: complete')
+        return readline
+
+    # readline completer: dictionary words starting with the input line
+    def complete(self, text, state):
+        if state == 0:
+            self.completions = self.get_completions(text)
+        if state < len(self.completions):
+            return self.completions[state]
+        return None
+
+    def get_completions(self, text):
+        from src.protocol import ServerError
+        from src.protocol import ServerUnavailable
+        prefix = text.strip()
+        if not prefix or prefix.startswith(':'):
+            return []
+        zh = not is_alphabet(prefix[0])
+        if not zh:
+            prefix = prefix.lower()
+        if self.use_direct():
+            return self.get_reader().get_prefix_words(prefix, self.COMPLETE_LIMIT, zh)
+        # from the server, but a Tab never waits for one that is not running
+        try:
+            if self.client.client is None:
+                self.client.connect(wait=0)
+            return self.client.get_prefix_words(prefix, self.COMPLETE_LIMIT)
+        except (ServerError, ConnectionError):
+            return []
+
+    def interaction_loop(self):
         while True:
             try:
                 inp = input('~ ')
@@ -179,9 +512,11 @@ class WudaoCommand:
                     print(':quit                    退出')
                     print(':note [filename]         设置生词本的名称')
                     print(':long                    切换完整模式(:short切换回去)')
+                    print('Tab                      补全单词')
                 elif inp.startswith(':note'):
+                    from src.UserSpace import UserSpaces
                     vec = inp.split()
-                    if len(vec) == 2 and vec[1]:
+                    if len(vec) == 2 and UserSpaces.is_note_name(vec[1]):
                         self.conf['notename'] = vec[1]
                         print('生词本指定为: ./usr/%s.txt' % (vec[1]))
                     else:
@@ -194,9 +529,17 @@ class WudaoCommand:
 
 
 def main():
+    # editor integrations: JSON-RPC on stdin/stdout, no server and no user files
+    if '--stdio' in sys.argv[1:]:
+        from src.StdioServer import StdioServer
+        StdioServer().run()
+        return
     app = WudaoCommand()
     app.param_parse()
-    app.query(app.word)
+    if app.format:
+        app.query_records(app.word)
+    else:
+        app.query(app.word)
 
 
 if __name__ == '__main__':
@@ -1,76 +1,594 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+import argparse
+import json
+import os
+import select
+import signal
 import socket
+import struct
 import sys
+import threading
+import time
+import traceback
 
+from src.AccessLog import AccessLog
+from src.AccessLog import StageTimer
+from src.CommandDraw import CommandDraw
 from src.JsonReader import JsonReader
+from src.JsonReader import EN_SHORT_FIELDS, ZH_SHORT_FIELDS
+from src.JsonReader import EN_COLD_FIELDS, ZH_COLD_FIELDS
+from src.JsonReader import needs_cold
+from src.JsonReader import project
+from src.OnlineCache import OnlineCache
+from src.Profiler import Profiler
+from src.UserSpace import UserSpaces
+from src.protocol import KIND_JSON, KIND_RAW, KIND_NONE, KIND_ERROR, KIND_RENDER, KIND_BINARY
+from src.protocol import MAX_REQUEST_LEN
+from src.protocol import send_frame
+from src.protocol import encode_word
+from src.protocol import ServerError
 from src.tools import is_alphabet
 from src.tools import ie
 from src.tools import get_ip
+from src.tools import get_cached_ip
+from src.tools import LazyValue
 from src.tools import report_new_word
 from src.tools import report_old_word
+from src.tools import LRUCache
+from src.tools import SingleFlight
+from src.tools import get_common_words
 
 
 class WudaoServer:
-    def __init__(self):
+    RENDER_CACHE_LEN = 2048
+    MAX_PREFIX_LIMIT = 200
+    # first fd passed by systemd socket activation
+    SD_LISTEN_FDS_START = 3
+    UNIX_SOCKET_PATH = '/tmp/wudao-dict.sock'
+    IP_TTL = 6 * 3600
+    # pid, TCP address and Unix socket path, one per line; written once the dictionary is loaded
+    PID_FILE_NAME = './usr/server.pid'
+
+    def __init__(self, http_port=None, listen_fd=None, idle_timeout=0, warm_words=1000,
+                 log_sample=1.0, slow_ms=50, unix_path=UNIX_SOCKET_PATH):
+        self.running = True
+        # exit after this many idle seconds, 0 means never
+        self.idle_timeout = idle_timeout
+        self.last_active = time.time()
+        self.inflight = 0
+        self.lock = threading.Lock()
+        # Listen before loading the index, early clients wait in the backlog instead of being refused
+        self.server = self.get_listen_socket(listen_fd)
+        self.listeners = [self.server]
+        # one server per host: local users connect here and are told apart by their uid
+        self.unix_path = None
+        if listen_fd is None and unix_path and hasattr(socket, 'AF_UNIX'):
+            unix_server = self.get_unix_socket(unix_path)
+            if unix_server is not None:
+                self.unix_path = unix_path
+                self.listeners.append(unix_server)
         self.json_reader = JsonReader()
-        self.ip = get_ip()
-        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.write_pid_file()
+        # request logs are written by a background thread, see src/AccessLog.py
+        self.access_log = AccessLog(log_sample, slow_ms)
+        # started and stopped at runtime, see admin commands and signals below
+        self.profiler = Profiler()
+        if hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1, self.on_signal)
+            signal.signal(signal.SIGUSR2, self.on_signal)
+        # rendered replies: (word, short, color) -> bytes
+        self.render_cache = LRUCache(self.RENDER_CACHE_LEN)
+        self.painters = {True: CommandDraw(True), False: CommandDraw(False)}
+        # identical lookups in flight at the same time are done once
+        self.flight = SingleFlight()
+        # online fallback: parser modules are imported once, in the background
+        self.online_cache = OnlineCache()
+        # history, notebooks and online cache of every user, see src/UserSpace.py
+        self.users = UserSpaces(self.online_cache)
+        self.online = None
+        self.online_error = None
+        self.online_ready = threading.Event()
+        threading.Thread(target=self.load_online, daemon=True).start()
+        # no network I/O at start-up, the report ip is looked up on first use
+        self.ip = LazyValue(get_ip, self.IP_TTL, get_cached_ip())
+        print('Server on...')
+        # HTTP API, shares the dictionary with the socket server
+        if http_port:
+            from src.WudaoHttp import WudaoHttpServer
+            try:
+                self.http_server = WudaoHttpServer(self.json_reader, ('127.0.0.1', http_port),
+                                                   access_log=self.access_log, profiler=self.profiler,
+                                                   begin_request=self.begin_request,
+                                                   end_request=self.end_request)
+            except OSError:
+                print('OSError: HTTP port %d has been used.' % http_port)
+                exit(0)
+            threading.Thread(target=self.http_server.serve_forever, daemon=True).start()
+            print('HTTP API on http://127.0.0.1:%d/v1/' % http_port)
+        # warm caches in the background, requests are served meanwhile
+        if warm_words:
+            threading.Thread(target=self.warm_up, args=(warm_words,), daemon=True).start()
+
+    # listening socket from systemd (LISTEN_FDS), from a launcher (--fd) or bound here
+    def get_listen_socket(self, listen_fd):
+        if listen_fd is None and os.environ.get('LISTEN_PID') == str(os.getpid()) \
+                and int(os.environ.get('LISTEN_FDS', '0')) >= 1:
+            listen_fd = self.SD_LISTEN_FDS_START
+        if listen_fd is not None:
+            server = socket.socket(fileno=listen_fd)
+            print('Using inherited socket (fd %d)' % listen_fd)
+            return server
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         # Singleton
         try:
-            self.server.bind(("0.0.0.0", 23764))
+            server.bind(("0.0.0.0", 23764))
         except OSError:
             print('OSError: Port has been used.')
             exit(0)
-        self.server.listen(0)
-        print('Server on...')
+        server.listen(128)
+        return server
+
+    # world-connectable Unix socket, None if the path belongs to someone else
+    def get_unix_socket(self, path):
+        # the TCP port is ours, so a socket file left at path is stale
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print('Unix socket disabled: %s' % e)
+            return None
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            server.bind(path)
+            os.chmod(path, 0o666)
+        except OSError as e:
+            print('Unix socket disabled: %s' % e)
+            server.close()
+            return None
+        server.listen(128)
+        return server
+
+    # tells wdd and other tools that this server is up and where it listens
+    def write_pid_file(self):
+        try:
+            with open(self.PID_FILE_NAME + '.tmp', 'w') as f:
+                f.write('%d\n127.0.0.1:23764\n%s\n' % (os.getpid(), self.unix_path or ''))
+            os.replace(self.PID_FILE_NAME + '.tmp', self.PID_FILE_NAME)
+        except OSError as e:
+            print('Cannot write %s: %s' % (self.PID_FILE_NAME, e))
+
+    def remove_pid_file(self):
+        try:
+            with open(self.PID_FILE_NAME, 'r') as f:
+                if f.readline().strip() != str(os.getpid()):
+                    return
+            os.unlink(self.PID_FILE_NAME)
+        except OSError:
+            pass
+
+    # uid of the process at the other end of a Unix socket, None if unknown (TCP)
+    @staticmethod
+    def get_peer_uid(conn):
+        if conn.family != getattr(socket, 'AF_UNIX', None):
+            return None
+        if hasattr(socket, 'SO_PEERCRED'):
+            creds = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+            pid, uid, gid = struct.unpack('3i', creds)
+            return uid
+        if hasattr(socket, 'LOCAL_PEERCRED'):
+            # macOS: struct xucred {cr_version, cr_uid, cr_ngroups, cr_groups[16]} at level SOL_LOCAL (0)
+            creds = conn.getsockopt(0, socket.LOCAL_PEERCRED, struct.calcsize('2Ih16I'))
+            return struct.unpack_from('2I', creds)[1]
+        return None
 
     def run(self):
-        while True:
-            # Get bytes
-            conn, addr = self.server.accept()
-            data = conn.recv(256)
-            word = data.decode('utf-8').strip()
-            print('Get:' + str(len(data)) + ' bytes ' + word)
-            # Shutdown
-            if word == '---shutdown keyword---':
-                self.server.close()
-                print('Bye!~~~')
-                sys.exit(0)
-            # Get word
+        while self.running:
+            # wake up regularly to notice shutdown requests and idleness
+            try:
+                ready = select.select(self.listeners, [], [], 0.5)[0]
+            except (OSError, ValueError):
+                break
+            if not ready:
+                if self.is_idle():
+                    print('Idle for %d seconds, exit.' % self.idle_timeout)
+                    break
+                continue
+            for listener in ready:
+                try:
+                    conn, addr = listener.accept()
+                except (BlockingIOError, InterruptedError):
+                    continue
+                except OSError:
+                    self.running = False
+                    break
+                # framed connections may stay open, so every connection gets its own thread
+                threading.Thread(target=self.handle, args=(conn,), daemon=True).start()
+        self.remove_pid_file()
+        for listener in self.listeners:
+            listener.close()
+        if self.unix_path:
             try:
-                word_info = None
-                if word:
-                    if is_alphabet(word[0]):
-                        word_info = self.json_reader.get_word_info(word)
-                    else:
-                        word_info = self.json_reader.get_zh_word_info(word)
-                if word_info is not None:
-                    conn.sendall(word_info.encode('utf-8'))
-                    print('Send: ' + str(len(word_info)) + ' bytes ')
-                else:
-                    conn.sendall('None'.encode('utf-8'))
-            except KeyError:
-                print('No words: ' + word)
+                os.unlink(self.unix_path)
+            except OSError:
+                pass
+        self.access_log.close()
+        print('Bye!~~~')
+        sys.exit(0)
+
+    def is_idle(self):
+        if not self.idle_timeout:
+            return False
+        with self.lock:
+            return self.inflight == 0 and time.time() - self.last_active > self.idle_timeout
+
+    # wrap every request, keeps the idle clock up to date
+    def begin_request(self):
+        with self.lock:
+            self.inflight += 1
+            self.last_active = time.time()
+
+    def end_request(self):
+        with self.lock:
+            self.inflight -= 1
+            self.last_active = time.time()
+
+    def stop(self):
+        self.running = False
+
+    def handle(self, conn):
+        try:
+            uid = self.get_peer_uid(conn)
+            first = conn.recv(1, socket.MSG_PEEK)
+            if first == b'{':
+                self.handle_framed(conn, uid)
+            elif first:
+                self.begin_request()
+                try:
+                    self.profiler.call(self.handle_legacy, conn, uid)
+                finally:
+                    self.end_request()
+        except OSError as e:
+            print('Connection error: ' + str(e))
+        finally:
             conn.close()
-            # report
-            # 停止扩充词典
-            # try:
-            #     if ie():
-            #         if word_info is None:
-            #             report_new_word(word, self.ip)
-            #             print('report new word')
-            #         else:
-            #             report_old_word(word, self.ip)
-            #             print('report old word')
-            #     else:
-            #         print('no ie, report failed')
-            # except:
-            #     print('exception occured, report failed')
+
+    # old clients: one word per connection, the reply ends when the connection closes
+    def handle_legacy(self, conn, uid=None):
+        timer = StageTimer()
+        # Get bytes
+        data = conn.recv(256)
+        word = data.decode('utf-8').strip()
+        # Shutdown
+        if word == '---shutdown keyword---':
+            if not self.users.is_admin(uid):
+                print('Shutdown refused for uid %s' % uid)
+                return
+            print('Shutdown requested')
+            self.stop()
+            return
+        timer.mark('recv')
+        # Get word
+        word_info = None
+        if word:
+            if is_alphabet(word[0]):
+                word_info = self.json_reader.get_word_info(word)
+            else:
+                word_info = self.json_reader.get_zh_word_info(word)
+        timer.mark('lookup')
+        body = word_info.encode('utf-8') if word_info is not None else b'None'
+        conn.sendall(body)
+        timer.mark('send')
+        self.access_log.log('legacy', word, 'J' if word_info is not None else 'N', len(body), timer)
+        # report
+        # 停止扩充词典
+        # try:
+        #     if ie():
+        #         if word_info is None:
+        #             report_new_word(word, self.ip.get())
+        #             print('report new word')
+        #         else:
+        #             report_old_word(word, self.ip.get())
+        #             print('report old word')
+        #     else:
+        #         print('no ie, report failed')
+        # except:
+        #     print('exception occured, report failed')
+
+    # framed clients: json request lines, length-prefixed replies, see src/protocol.py
+    def handle_framed(self, conn, uid=None):
+        rfile = conn.makefile('rb')
+        while self.running:
+            line = rfile.readline(MAX_REQUEST_LEN)
+            if not line:
+                break
+            timer = StageTimer()
+            try:
+                req = json.loads(line.decode('utf-8'))
+                if not isinstance(req, dict):
+                    raise ValueError('request must be an object')
+            except ValueError as e:
+                send_frame(conn, KIND_ERROR, ('Bad request: %s' % e).encode('utf-8'))
+                break
+            timer.mark('parse')
+            self.begin_request()
+            try:
+                try:
+                    kind, body = self.profiler.call(self.dispatch, req, timer, uid)
+                except Exception:
+                    # a bug or an unexpected request, the connection and server carry on
+                    traceback.print_exc()
+                    kind, body = KIND_ERROR, b'Internal server error'
+                send_frame(conn, kind, body)
+                timer.mark('send')
+            finally:
+                self.end_request()
+            word = req.get('q', req.get('prefix', req.get('cmd')))
+            self.access_log.log('framed', word, kind.decode(), len(body), timer)
+
+    # request dict -> (kind, body), timer collects the stage timings
+    # uid: Unix socket peer, picks the user's namespace together with req['token']
+    def dispatch(self, req, timer, uid=None):
+        if 'cmd' in req:
+            if not self.users.is_admin(uid):
+                return KIND_ERROR, b'Admin commands are only allowed for the server owner'
+            if req['cmd'] == 'shutdown':
+                print('Shutdown requested')
+                self.stop()
+                return KIND_NONE, b''
+            if req['cmd'] == 'profile':
+                try:
+                    res = self.toggle_profiler(req.get('mode', 'sample'))
+                except ValueError as e:
+                    return KIND_ERROR, str(e).encode('utf-8')
+                return KIND_JSON, json.dumps(res).encode('utf-8')
+            if req['cmd'] == 'stacks':
+                return KIND_JSON, json.dumps({'file': os.path.abspath(self.profiler.dump_stacks())}).encode('utf-8')
+            return KIND_ERROR, ('Bad command: %s' % req['cmd']).encode('utf-8')
+        if 'prefix' in req:
+            return self.get_prefix_words(req, timer)
+        word = str(req.get('q', '')).strip()
+        if not word:
+            return KIND_NONE, b''
+        zh = not is_alphabet(word[0])
+        fields = req.get('fields')
+        if fields is not None:
+            if not isinstance(fields, list) or not all(isinstance(v, str) for v in fields):
+                return KIND_ERROR, b'Bad fields: must be a list of field names'
+            fields = frozenset(fields)
+        online = bool(req.get('online'))
+        binary = bool(req.get('bin'))
+        # the notebook is a file in the user's directory, never a path the client picks
+        track = req.get('track')
+        if isinstance(track, dict) and track.get('note') is not None and \
+                not UserSpaces.is_note_name(track['note']):
+            return KIND_ERROR, b'Bad notebook name'
+        space = self.users.get(uid, req.get('token'))
+        try:
+            if req.get('render'):
+                short, color = req['render'] == 'short', bool(req.get('color', True))
+                body = self.get_rendered(word, zh, short, color)
+                timer.mark('render')
+                if body is None and online:
+                    word_info = self.get_online(word, zh, space)
+                    timer.mark('online')
+                    if word_info is not None:
+                        body = self.render_info(word_info, zh, short, color)
+                        timer.mark('render')
+                if body is None:
+                    return KIND_NONE, b''
+                # history and notebook of the user, like the client used to write them;
+                # not for unknown TCP clients, they would write into the owner's usr/
+                if isinstance(track, dict) and not zh and self.users.is_known(uid, req.get('token')):
+                    end = body.index(b'\n')
+                    meta = json.loads(body[:end].decode('utf-8'))
+                    space.track(meta, track.get('note'))
+                    # the client records the word itself unless the reply says it is done
+                    meta['tracked'] = True
+                    body = json.dumps(meta).encode('utf-8') + body[end:]
+                    timer.mark('track')
+                return KIND_RENDER, body
+            if online and not self.json_reader.has_word(word, zh):
+                word_info = self.get_online(word, zh, space)
+                timer.mark('online')
+                if word_info is None:
+                    return KIND_NONE, b''
+                if binary:
+                    return KIND_BINARY, encode_word(project(word_info, fields))
+                return KIND_JSON, json.dumps(project(word_info, fields)).encode('utf-8')
+        except ServerError as e:
+            # only the online search raises it
+            timer.mark('online')
+            return KIND_ERROR, str(e).encode('utf-8')
+        # client decodes the record itself, send it straight from the map
+        if req.get('raw'):
+            if zh:
+                raw = self.json_reader.get_zh_word_raw(word, not needs_cold(fields, ZH_COLD_FIELDS))
+            else:
+                raw = self.json_reader.get_word_raw(word, not needs_cold(fields, EN_COLD_FIELDS))
+            timer.mark('lookup')
+            if raw is None:
+                return KIND_NONE, b''
+            return KIND_RAW, raw
+        if binary:
+            body = self.flight.do(('bin', word, fields), self.get_word_bin, word, zh, fields)
+            timer.mark('lookup')
+            if body is None:
+                return KIND_NONE, b''
+            return KIND_BINARY, body
+        word_info = self.flight.do(('json', word, fields), self.get_word_info, word, zh, fields)
+        timer.mark('lookup')
+        if word_info is None:
+            return KIND_NONE, b''
+        return KIND_JSON, word_info.encode('utf-8')
+
+    # prefix request -> json list of words, for completion
+    def get_prefix_words(self, req, timer):
+        prefix = str(req['prefix']).strip()
+        try:
+            limit = max(1, min(int(req.get('limit', 20)), self.MAX_PREFIX_LIMIT))
+        except (TypeError, ValueError):
+            return KIND_ERROR, b'Bad limit'
+        words = []
+        if prefix:
+            zh = not is_alphabet(prefix[0])
+            words = self.json_reader.get_prefix_words(prefix if zh else prefix.lower(), limit, zh)
+        timer.mark('lookup')
+        return KIND_JSON, json.dumps(words, ensure_ascii=False).encode('utf-8')
+
+    # start a profiler session, or stop the running one and write its results to usr/
+    def toggle_profiler(self, mode='sample'):
+        running, file_name = self.profiler.toggle(mode)
+        if running:
+            print('Profiler started (%s)' % mode)
+            return {'running': True, 'mode': mode}
+        file_name = os.path.abspath(file_name)
+        print('Profile: ' + file_name)
+        return {'running': False, 'file': file_name}
+
+    # SIGUSR1 toggles the profiler, SIGUSR2 dumps the thread stacks. The handler runs in
+    # the main thread between select() calls, an error escaping it would stop run().
+    def on_signal(self, signum, frame):
+        try:
+            if signum == signal.SIGUSR1:
+                self.toggle_profiler()
+            else:
+                print('Stacks: ' + self.profiler.dump_stacks())
+        except Exception:
+            traceback.print_exc()
+
+    # pre-fault the data files and pre-render the n most frequent words
+    def warm_up(self, n):
+        start = time.time()
+        self.json_reader.prefetch()
+        try:
+            with open('./usr/usr_word.json', 'r') as f:
+                counts = json.load(f)
+        except (OSError, ValueError):
+            counts = {}
+        try:
+            with open('./usr/conf.json', 'r') as f:
+                short = bool(json.load(f).get('short', False))
+        except (OSError, ValueError, AttributeError):
+            short = False
+        # the user's own lookups first, then the general frequency order
+        ranked = sorted(counts, key=lambda w: -counts[w]) + get_common_words()
+        warmed = 0
+        seen = set()
+        for word in ranked:
+            if warmed >= min(n, self.RENDER_CACHE_LEN) or not self.running:
+                break
+            if not word or word in seen or not is_alphabet(word[0]):
+                continue
+            seen.add(word)
+            # real queries go first
+            while self.inflight and self.running:
+                time.sleep(0.005)
+            if self.get_rendered(word, False, short, True) is not None:
+                warmed += 1
+        print('Warmed %d words in %.2fs' % (warmed, time.time() - start))
+
+    def get_word_info(self, word, zh, fields):
+        if zh:
+            return self.json_reader.get_zh_word_info(word, fields)
+        return self.json_reader.get_word_info(word, fields)
+
+    def get_word_bin(self, word, zh, fields):
+        if zh:
+            word_info = self.json_reader.get_zh_word_dict(word, fields)
+        else:
+            word_info = self.json_reader.get_word_dict(word, fields)
+        if word_info is None:
+            return None
+        return encode_word(word_info)
+
+    # terminal output for word, rendered once per word and mode
+    def get_rendered(self, word, zh, short, color):
+        key = (word, short, color)
+        body = self.render_cache.get(key)
+        if body is not None:
+            return body
+        return self.flight.do(('render',) + key, self.render, word, zh, short, color)
+
+    def render(self, word, zh, short, color):
+        # short mode never shows sentences, don't decode them
+        if zh:
+            word_info = self.json_reader.get_zh_word_dict(word, ZH_SHORT_FIELDS if short else None)
+        else:
+            word_info = self.json_reader.get_word_dict(word, EN_SHORT_FIELDS if short else None)
+        if word_info is None:
+            return None
+        body = self.render_info(word_info, zh, short, color)
+        self.render_cache.put((word, short, color), body)
+        return body
+
+    def render_info(self, word_info, zh, short, color):
+        conf = {'short': short}
+        # the client still needs these for its history and notebook
+        meta = {'word': word_info['word'], 'pronunciation': word_info['pronunciation'],
+                'paraphrase': word_info['paraphrase']}
+        if zh:
+            text = self.painters[color].render_zh_text(word_info, conf)
+        else:
+            text = self.painters[color].render_text(word_info, conf)
+        return json.dumps(meta).encode('utf-8') + b'\n' + text.encode('utf-8')
+
+    def load_online(self):
+        try:
+            from src import WudaoOnline
+            self.online = WudaoOnline
+        except ImportError:
+            self.online_error = 'Error: Dependencies missing for online search.\n' \
+                                'Please install bs4 and lxml first.\n' \
+                                'Use ' + CommandDraw.RED_PATTERN % 'sudo pip3 install bs4 lxml' + ' or get them online.'
+        self.online_ready.set()
+
+    # word info from the user's online cache or from Youdao, None if not found
+    def get_online(self, word, zh, space):
+        word_info = space.online_cache.get(word)
+        if word_info is not None:
+            return word_info
+        # N clients missing the same word make one request to Youdao
+        word_info = self.flight.do(('online', word), self.fetch_online, word, zh)
+        if word_info is not None:
+            space.online_cache.put(word_info)
+        return word_info
+
+    def fetch_online(self, word, zh):
+        self.online_ready.wait()
+        if self.online is None:
+            raise ServerError(self.online_error)
+        try:
+            if zh:
+                word_info = self.online.get_zh_text(word)
+            else:
+                word_info = self.online.get_text(word)
+        except Exception as e:
+            raise ServerError('Error during online search: %s' % e)
+        if not word_info or not word_info.get('paraphrase'):
+            return None
+        return word_info
 
 
 if __name__ == '__main__':
-    ws = WudaoServer()
+    parser = argparse.ArgumentParser(description='Wudao-dict server.')
+    parser.add_argument('--http', type=int, nargs='?', const=23765, default=None, metavar='PORT',
+                        help='also serve the HTTP/JSON API on 127.0.0.1:PORT (default: 23765)')
+    parser.add_argument('--fd', type=int, default=None,
+                        help='serve on an already listening socket inherited from a launcher')
+    parser.add_argument('--idle-timeout', type=int, default=int(os.environ.get('WUDAO_IDLE_TIMEOUT', '0')),
+                        metavar='SECONDS', help='exit after SECONDS without requests (default: never)')
+    parser.add_argument('--warm', type=int, default=1000, metavar='N',
+                        help='pre-render the N most frequent words after start-up (default: 1000, 0 disables)')
+    parser.add_argument('--log-sample', type=float, default=1.0, metavar='RATE',
+                        help='fraction of requests written to usr/access.log (default: 1.0, 0 disables)')
+    parser.add_argument('--slow-ms', type=float, default=50, metavar='MS',
+                        help='log requests slower than MS to usr/slow.log (default: 50, 0 disables)')
+    parser.add_argument('--unix', default=WudaoServer.UNIX_SOCKET_PATH, metavar='PATH',
+                        help='also listen on this Unix socket, shared by all local users '
+                             '(default: %(default)s, empty disables)')
+    args = parser.parse_args()
+    ws = WudaoServer(args.http, args.fd, args.idle_timeout, args.warm, args.log_sample, args.slow_ms, args.unix)
     ws.run()
-
@@ -0,0 +1,77 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# Per-lookup cost of the client libraries on a warm connection pool
+# Usage: python3 bench_clients.py [-n LOOKUPS] [-c CONNECTIONS]   (run in the wudao-dict directory,
+#        with a server running)
+
+import argparse
+import asyncio
+import threading
+import time
+
+from src.AsyncWudaoClient import AsyncWudaoClient
+from src.JsonReader import JsonReader
+from src.WudaoClient import WudaoClient
+from src.WudaoClientPool import WudaoClientPool
+
+
+def report(name, n, seconds):
+    print('%-34s %8.1f us/lookup %9.0f lookups/s' % (name, seconds * 1e6 / n, n / seconds))
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def bench_threads(pool, words, threads):
+    def work(part):
+        for word in part:
+            pool.get_word_dict(word)
+    workers = [threading.Thread(target=work, args=(words[i::threads],)) for i in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+
+
+async def bench_async(words, connections):
+    async with AsyncWudaoClient(max_connections=connections) as client:
+        # warm the pool
+        await client.get_words_dict(words[:connections * 4])
+        start = time.perf_counter()
+        for word in words:
+            await client.get_word_dict(word)
+        report('async, one at a time', len(words), time.perf_counter() - start)
+        start = time.perf_counter()
+        await client.get_words_dict(words)
+        report('async get_words_dict', len(words), time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Client library lookup cost')
+    parser.add_argument('-n', type=int, default=5000, help='lookups per measurement')
+    parser.add_argument('-c', type=int, default=8, help='pool size and threads')
+    args = parser.parse_args()
+    words = list(JsonReader().index_dict)
+    words = (words * (args.n // len(words) + 1))[:args.n]
+
+    client = WudaoClient()
+    client.get_word_dict(words[0])
+    report('WudaoClient', len(words), timed(lambda: [client.get_word_dict(w) for w in words]))
+    report('WudaoClient.get_words_dict', len(words), timed(lambda: list(client.get_words_dict(words))))
+    client.close()
+
+    pool = WudaoClientPool(max_connections=args.c)
+    bench_threads(pool, words[:args.c * 4], args.c)
+    report('WudaoClientPool, 1 thread', len(words), timed(lambda: [pool.get_word_dict(w) for w in words]))
+    report('WudaoClientPool, %d threads' % args.c, len(words), timed(lambda: bench_threads(pool, words, args.c)))
+    report('WudaoClientPool.get_words_dict', len(words), timed(lambda: pool.get_words_dict(words)))
+    pool.close()
+
+    asyncio.run(bench_async(words, args.c))
+
+
+if __name__ == '__main__':
+    main()
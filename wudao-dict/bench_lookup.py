@@ -0,0 +1,82 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# Single-query latency: in-process lookup vs the client/server path
+# Usage: python3 bench_lookup.py [-n RUNS] [WORD]   (run in the wudao-dict directory)
+# The end-to-end runs are real `wd WORD` calls, they count in the history like any other.
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+from src.JsonReader import JsonReader
+from src.WudaoClient import WudaoClient
+from src.protocol import ServerUnavailable
+
+
+def ms(t):
+    return '%8.2f ms' % (t * 1000)
+
+
+# best and median of runs of fn()
+def measure(fn, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return times[0], times[len(times) // 2]
+
+
+def wd(word, direct):
+    env = dict(os.environ, WUDAO_DIRECT='1' if direct else '0')
+    subprocess.run([sys.executable, 'WudaoCommand.py', word], env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='In-process vs client/server lookup latency')
+    parser.add_argument('word', nargs='?', default='hello')
+    parser.add_argument('-n', type=int, default=20, help='runs per measurement')
+    args = parser.parse_args()
+    word = args.word
+
+    print('in-process                       best      median')
+    for name, bin_index in (('open, text index', False), ('open, binary index', True)):
+        if bin_index and not JsonReader.has_bin_index('./dict/en.ind', './dict/en.idx'):
+            print('%-24s  (no dict/en.idx, build it with python3 -m src.BinIndex)' % name)
+            continue
+        best, median = measure(lambda: JsonReader(bin_index), max(3, args.n // 4))
+        print('%-24s %s %s' % (name, ms(best), ms(median)))
+        reader = JsonReader(bin_index)
+        best, median = measure(lambda: reader.get_word_dict(word), args.n * 10)
+        print('%-24s %s %s' % ('  + lookup', ms(best), ms(median)))
+
+    # the server is started here if none runs, and stopped again afterwards
+    client = WudaoClient()
+    server = None
+    try:
+        client.connect(wait=0)
+    except ServerUnavailable:
+        server = subprocess.Popen([sys.executable, 'WudaoServer.py', '--warm', '0'],
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        client.connect()
+    client.get_word_dict(word)
+    print('client/server (warm)')
+    best, median = measure(lambda: client.get_word_rendered(word, False), args.n * 10)
+    print('%-24s %s %s' % ('  rendered request', ms(best), ms(median)))
+    client.disconnect()
+
+    print('end to end: python3 WudaoCommand.py %s' % word)
+    for name, direct in (('server', False), ('in-process', True)):
+        best, median = measure(lambda: wd(word, direct), args.n)
+        print('%-24s %s %s' % ('  ' + name, ms(best), ms(median)))
+    if server is not None:
+        client.shutdown_server()
+        server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# Compare the binary word encoding (src/protocol.py) with json on dictionary entries
+# Usage: python3 bench_wire.py [-n SAMPLE] [--short]   (run in the wudao-dict directory)
+
+import argparse
+import json
+import time
+
+from src.JsonReader import JsonReader
+from src.JsonReader import EN_SHORT_FIELDS, ZH_SHORT_FIELDS
+from src.protocol import encode_word, decode_word
+
+
+# n entries spread evenly over both dictionaries
+def sample_entries(reader, n, short):
+    entries = []
+    for zh in (False, True):
+        words = reader.get_prefix_words('', 10 ** 7, zh)
+        step = max(1, len(words) // n)
+        for word in words[::step][:n]:
+            if zh:
+                entries.append(reader.get_zh_word_dict(word, ZH_SHORT_FIELDS if short else None))
+            else:
+                entries.append(reader.get_word_dict(word, EN_SHORT_FIELDS if short else None))
+    return entries
+
+
+# best of `rounds` runs, in microseconds per entry
+def timeit(func, items, rounds=5):
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for item in items:
+            func(item)
+        t = time.perf_counter() - start
+        if best is None or t < best:
+            best = t
+    return best * 1e6 / len(items)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Binary vs json wire format')
+    parser.add_argument('-n', type=int, default=2000, help='entries per dictionary')
+    parser.add_argument('--short', action='store_true', help='only the short display fields')
+    args = parser.parse_args()
+    entries = sample_entries(JsonReader(), args.n, args.short)
+    codecs = [
+        ('json', lambda d: json.dumps(d).encode('utf-8'), lambda b: json.loads(b.decode('utf-8'))),
+        ('json utf-8', lambda d: json.dumps(d, ensure_ascii=False).encode('utf-8'),
+         lambda b: json.loads(b.decode('utf-8'))),
+        ('binary', encode_word, decode_word),
+    ]
+    print('%d entries%s' % (len(entries), ' (short fields)' if args.short else ''))
+    print('%-12s %12s %12s %12s' % ('format', 'bytes/entry', 'encode us', 'decode us'))
+    for name, encode, decode in codecs:
+        bodies = [encode(d) for d in entries]
+        assert [decode(b) for b in bodies] == entries
+        size = sum(len(b) for b in bodies) / len(bodies)
+        print('%-12s %12.0f %12.1f %12.1f' % (name, size, timeit(encode, entries), timeit(decode, bodies)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# Build wd.pyz: WudaoCommand and src/ in one executable zipapp with precompiled bytecode.
+# It runs from any directory without the wd -> wdd -> python3 chain of setup.sh:
+#     sudo cp wd.pyz /usr/local/bin/wd
+# Usage: python3 build_zipapp.py [-o wd.pyz] [--home DIR] [--bench RUNS]   (run in the wudao-dict directory)
+#
+# The dictionary and usr/ are found in the directory it was built in (--home), or in
+# $WUDAO_HOME. The bytecode is for the python3 that builds it; another version of python3
+# compiles the sources in the archive instead, so rebuild after upgrading Python or wudao-dict.
+
+import argparse
+import glob
+import os
+import py_compile
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import zipapp
+
+# modules `wd` may import, WudaoServer.py keeps running from the checkout
+SOURCES = ['WudaoCommand.py'] + sorted(glob.glob('src/*.py'))
+
+MAIN = '''# -*- coding: utf-8 -*-
+# wd in one file, built by build_zipapp.py
+import os
+import sys
+
+# the wudao-dict directory, with dict/ and usr/
+HOME = %r
+SOCKET_PATH = '/tmp/wudao-dict.sock'
+
+
+# as in wdd: our server wrote its pid, or another user's shared server has the socket
+# (root's or the dictionary owner's, see WudaoClient.is_trusted_socket)
+def server_running():
+    try:
+        with open('./usr/server.pid', 'r') as f:
+            os.kill(int(f.readline()), 0)
+        return True
+    except (OSError, ValueError):
+        pass
+    from src.WudaoClient import WudaoClient
+    try:
+        return WudaoClient.is_trusted_socket(SOCKET_PATH) and os.stat(SOCKET_PATH).st_uid != os.getuid()
+    except OSError:
+        return False
+
+
+def start_server():
+    import subprocess
+    with open('./usr/server.log', 'w') as log:
+        subprocess.Popen([sys.executable, 'WudaoServer.py'], stdin=subprocess.DEVNULL,
+                         stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+
+
+def main():
+    cwd = os.getcwd()
+    os.chdir(os.environ.get('WUDAO_HOME', HOME))
+    # files named on the command line are where wd was run
+    args = sys.argv[1:]
+    for i, v in enumerate(args[:-1]):
+        if v in ('-f', '--file') and args[i + 1] != '-':
+            args[i + 1] = os.path.join(cwd, args[i + 1])
+    if '--export-notebook' in args and os.path.isfile(os.path.join(cwd, args[-1])):
+        args[-1] = os.path.join(cwd, args[-1])
+    sys.argv[1:] = args
+    # editor integrations look words up in-process, no server needed
+    if '--stdio' not in args and not server_running():
+        start_server()
+    import WudaoCommand
+    WudaoCommand.main()
+
+
+main()
+'''
+
+
+def build(out_name, home):
+    with tempfile.TemporaryDirectory() as tmp:
+        os.mkdir(os.path.join(tmp, 'src'))
+        for name in SOURCES:
+            shutil.copy(name, os.path.join(tmp, name))
+        with open(os.path.join(tmp, '__main__.py'), 'w', encoding='utf-8') as f:
+            f.write(MAIN % home)
+        # name.pyc next to name.py is what zipimport loads, before the source; the archive
+        # does not change, so the bytecode is not checked against it
+        for name in SOURCES + ['__main__.py']:
+            path = os.path.join(tmp, name)
+            py_compile.compile(path, cfile=path + 'c', doraise=True,
+                               invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH)
+        zipapp.create_archive(tmp, out_name, interpreter='/usr/bin/env python3')
+
+
+# median time of `wd hello` through the wrapper setup.sh installs and through the zipapp,
+# run alternately; start the server first, both would start it otherwise
+def bench(out_name, home, runs):
+    commands = (('wd -> wdd -> python3', ['bash', '-c', 'cd "$0" && ./wdd "$@"', home, 'hello']),
+                (out_name, [os.path.abspath(out_name), 'hello']))
+    times = {name: [] for name, _ in commands}
+    for _ in range(runs):
+        for name, cmd in commands:
+            start = time.perf_counter()
+            subprocess.run(cmd, stdout=subprocess.DEVNULL, check=True)
+            times[name].append(time.perf_counter() - start)
+    for name, _ in commands:
+        print('%-24s %6.1f ms (median of %d)' % (name, statistics.median(times[name]) * 1000, runs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build wd as a single-file zipapp')
+    parser.add_argument('-o', '--output', default='wd.pyz')
+    parser.add_argument('--home', default=os.getcwd(), help='wudao-dict directory with dict/ and usr/')
+    parser.add_argument('--bench', type=int, metavar='RUNS', help='compare its startup with the wd wrapper')
+    args = parser.parse_args()
+    home = os.path.abspath(args.home)
+    if not os.path.isdir(os.path.join(home, 'dict')):
+        print('No dictionary in %s, run in the wudao-dict directory or give --home' % home, file=sys.stderr)
+        sys.exit(1)
+    build(args.output, home)
+    print('%s: %d modules, %d KB, home %s' % (args.output, len(SOURCES), os.path.getsize(args.output) // 1024, home))
+    if args.bench:
+        bench(args.output, home, args.bench)
+
+
+if __name__ == '__main__':
+    main()
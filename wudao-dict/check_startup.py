@@ -0,0 +1,65 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# Startup budget of `wd`: what importing WudaoCommand costs, measured with python3 -X importtime
+# Usage: python3 check_startup.py [-n RUNS] [--budget-ms MS]   (run in the wudao-dict directory)
+# Exits with 1 if the import takes longer than the budget or loads a module
+# that only some queries need, so it can run before a commit or in CI.
+
+import argparse
+import subprocess
+import sys
+
+# best-of-runs time to import WudaoCommand, `python3 -X importtime` adds some overhead to it.
+# It was 65 ms when urllib.request was imported by src.tools; about 22 ms remain, most of
+# it json (and re, which json imports). The margin is for slow or busy machines.
+BUDGET_MS = 40
+# modules WudaoCommand must not import up front: the network stack, the client
+# socket, the dictionary reader and online search are imported when a query uses them
+FORBIDDEN = ('urllib.request', 'http.client', 'email', 'concurrent.futures', 'hashlib', 'socket',
+             'mmap', 'zlib', 'src.WudaoClient', 'src.JsonReader', 'src.WudaoOnline', 'bs4', 'lxml')
+
+
+# {module: cumulative us} of the imports of one fresh interpreter running `code`
+def import_times(code='import WudaoCommand'):
+    res = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                         stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True)
+    times = {}
+    for line in res.stderr.decode('utf-8').splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the import time budget of WudaoCommand')
+    parser.add_argument('-n', type=int, default=10, help='runs, the best one counts')
+    parser.add_argument('--budget-ms', type=float, default=BUDGET_MS)
+    parser.add_argument('-v', '--verbose', action='store_true', help='list the slowest imports')
+    args = parser.parse_args()
+
+    runs = [import_times() for _ in range(max(1, args.n))]
+    best = min(runs, key=lambda t: t['WudaoCommand'])
+    total_ms = best['WudaoCommand'] / 1000
+    failed = False
+    print('import WudaoCommand: %.1f ms (budget %.1f ms, best of %d)' % (total_ms, args.budget_ms, len(runs)))
+    if args.verbose:
+        # without the modules the interpreter imports by itself
+        startup = import_times('pass')
+        own = [(name, us) for name, us in best.items() if name not in startup and name != 'WudaoCommand']
+        for name, us in sorted(own, key=lambda kv: -kv[1])[:15]:
+            print('  %8.1f ms  %s' % (us / 1000, name))
+    if total_ms > args.budget_ms:
+        print('over budget')
+        failed = True
+    loaded = sorted(m for m in best if m in FORBIDDEN or m.startswith(tuple(f + '.' for f in FORBIDDEN)))
+    if loaded:
+        print('imported at startup, should be imported where used: %s' % ', '.join(loaded))
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -23,7 +23,7 @@ def process_word(word, cache_dir):
     dcache_path = os.path.join(cache_dir, word)
     if not os.path.exists(dcache_path):
         logging.warning(f"Cache file not found for '{word}' at '{dcache_path}'")
-        return None, None # Return None for both word_data and raw_word
+        return None, None, None
 
     try:
         with open(dcache_path, 'r', encoding='utf-8') as f:
@@ -42,18 +42,33 @@ def process_word(word, cache_dir):
         pattern = word_data.get('pattern', '')
         sentence = json.dumps(word_data.get('sentence', []), ensure_ascii=False, separators=(',', ':'))
 
-        # Format the line for compression
-        afline = f"{word_test}|{wid}|{us_phonetic}|{uk_phonetic}|{unknown_phonetic}|{paraphrase}|{rank}|{pattern}|{sentence}"
-        return afline, raw_word
+        # Hot fields (everything the short mode shows) and cold fields (sentences)
+        hot = f"{word_test}|{wid}|{us_phonetic}|{uk_phonetic}|{unknown_phonetic}|{paraphrase}|{rank}|{pattern}"
+        cold = [sentence]
+        return hot, cold, raw_word
 
     except json.JSONDecodeError as e:
         logging.error(f"Error decoding JSON from {dcache_path}: {e}")
-        return None, None
+        return None, None, None
     except Exception as e:
         logging.error(f"Error processing file {dcache_path}: {e}")
-        return None, None
-
-def compress_dictionary(input_file, output_file, index_file, cache_dir):
+        return None, None, None
+
+def compress_record(hot, cold, split):
+    """Compresses one record.
+
+    Legacy records are a single zlib stream of all fields joined by '|'. Split
+    records are the hot fields in one stream followed by the cold fields (joined
+    by newlines) in a second one, so short lookups only inflate the first.
+    Returns (data, hot_len), hot_len is 0 for legacy records.
+    """
+    if not split:
+        return zlib.compress('|'.join([hot] + cold).encode('utf8'), COMPRESSION_LEVEL), 0
+    hot_data = zlib.compress(hot.encode('utf8'), COMPRESSION_LEVEL)
+    cold_data = zlib.compress('\n'.join(cold).encode('utf8'), COMPRESSION_LEVEL)
+    return hot_data + cold_data, len(hot_data)
+
+def compress_dictionary(input_file, output_file, index_file, cache_dir, split=False):
     """Reads words from input_file, processes cache, compresses, and writes output files."""
     word_list = []
     # Read word list
@@ -77,11 +92,11 @@ def compress_dictionary(input_file, output_file, index_file, cache_dir):
     skipped_count = 0
 
     for i, word in enumerate(word_list):
-        afline, raw_word_for_index = process_word(word, cache_dir)
-        if afline and raw_word_for_index:
+        hot, cold, raw_word_for_index = process_word(word, cache_dir)
+        if hot and raw_word_for_index:
             try:
-                acf_line = zlib.compress(afline.encode('utf8'), COMPRESSION_LEVEL)
-                processed_data.append({'index_word': raw_word_for_index, 'data': acf_line})
+                acf_line, hot_len = compress_record(hot, cold, split)
+                processed_data.append({'index_word': raw_word_for_index, 'data': acf_line, 'hot_len': hot_len})
                 processed_count += 1
             except zlib.error as e:
                 logging.error(f"Error compressing data for word '{word}': {e}")
@@ -105,7 +120,10 @@ def compress_dictionary(input_file, output_file, index_file, cache_dir):
         current_offset = 0
         with open(output_file, 'wb') as fw, open(index_file, 'w', encoding='utf-8') as fi:
             for item in processed_data:
-                fi.write(f"{item['index_word']}|{current_offset}\n")
+                if item['hot_len']:
+                    fi.write(f"{item['index_word']}|{current_offset}|{item['hot_len']}\n")
+                else:
+                    fi.write(f"{item['index_word']}|{current_offset}\n")
                 data_len = fw.write(item['data'])
                 current_offset += data_len
             # Add final entry to index to mark the end? Or is the length calculation sufficient?
@@ -138,6 +156,8 @@ if __name__ == "__main__":
                         help=f"Path to the output index file (default: {DEFAULT_INDEX_FILE})")
     parser.add_argument("-c", "--cache", default=DEFAULT_CACHE_DIR,
                         help=f"Path to the cache directory containing JSON files (default: {DEFAULT_CACHE_DIR})")
+    parser.add_argument("--split", action="store_true",
+                        help="Write hot/cold split records (short lookups skip the sentences)")
 
     args = parser.parse_args()
 
@@ -145,7 +165,7 @@ if __name__ == "__main__":
         logging.error(f"Cache directory '{args.cache}' not found or is not a directory.")
         sys.exit(1)
 
-    if compress_dictionary(args.input, args.output, args.index, args.cache):
+    if compress_dictionary(args.input, args.output, args.index, args.cache, args.split):
         logging.info("Compression process completed successfully.")
         sys.exit(0)
     else:
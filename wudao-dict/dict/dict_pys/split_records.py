@@ -0,0 +1,61 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# Convert a legacy en.z/zh.z dictionary to hot/cold split records, see src/JsonReader.py
+
+import zlib
+import sys
+import argparse
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+COMPRESSION_LEVEL = 6
+# number of hot fields at the start of a record, and of all fields
+HOT_FIELDS = {'en': 8, 'zh': 4}
+ALL_FIELDS = {'en': 9, 'zh': 6}
+
+def read_index(index_file):
+    """Returns [(word, offset)] in file order, without the __EOF__ marker."""
+    entries = []
+    with open(index_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            parts = line.rstrip('\n').split('|')
+            if len(parts) > 2:
+                raise ValueError(f"'{index_file}' already holds split records")
+            entries.append((parts[0], int(parts[1])))
+    if entries and entries[-1][0] == '__EOF__':
+        entries.pop()
+    return entries
+
+def convert(lang, data_file, index_file, output_file, output_index):
+    entries = read_index(index_file)
+    with open(data_file, 'rb') as f:
+        data = f.read()
+    n_hot = HOT_FIELDS[lang]
+    current_offset = 0
+    with open(output_file, 'wb') as fw, open(output_index, 'w', encoding='utf-8') as fi:
+        for i, (word, offset) in enumerate(entries):
+            end = entries[i + 1][1] if i + 1 < len(entries) else len(data)
+            parts = zlib.decompress(data[offset:end]).decode('utf8').split('|', ALL_FIELDS[lang] - 1)
+            hot_data = zlib.compress('|'.join(parts[:n_hot]).encode('utf8'), COMPRESSION_LEVEL)
+            cold_data = zlib.compress('\n'.join(parts[n_hot:]).encode('utf8'), COMPRESSION_LEVEL)
+            fi.write(f"{word}|{current_offset}|{len(hot_data)}\n")
+            current_offset += fw.write(hot_data) + fw.write(cold_data)
+            if (i + 1) % 10000 == 0:
+                logging.info(f"Converted {i + 1}/{len(entries)} records...")
+        fi.write(f"__EOF__|{current_offset}\n")
+    logging.info(f"Converted {len(entries)} records to '{output_file}' / '{output_index}'")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert legacy dictionary records to hot/cold split records.")
+    parser.add_argument("lang", choices=sorted(HOT_FIELDS), help="Which dictionary the files hold")
+    parser.add_argument("--data", required=True, help="Legacy data file (en.z / zh.z)")
+    parser.add_argument("--index", required=True, help="Legacy index file (en.ind / zh.ind)")
+    parser.add_argument("-o", "--output", required=True, help="Output data file")
+    parser.add_argument("-x", "--output-index", required=True, help="Output index file")
+    args = parser.parse_args()
+    try:
+        convert(args.lang, args.data, args.index, args.output, args.output_index)
+    except (IOError, ValueError, zlib.error) as e:
+        logging.error(f"Conversion failed: {e}")
+        sys.exit(1)
@@ -21,7 +21,7 @@ def build_index(index_file_path):
 
             # Handle the first line separately
             try:
-                prev_word, prev_offset_str = lines[0].strip().split('|')
+                prev_word, prev_offset_str = lines[0].strip().split('|')[:2]
                 prev_offset = int(prev_offset_str)
             except (ValueError, IndexError) as e:
                 print(f"Error parsing first line in index file '{index_file_path}': {e}", file=sys.stderr)
@@ -30,7 +30,7 @@ def build_index(index_file_path):
             # Process subsequent lines
             for line in lines[1:]:
                 try:
-                    word, offset_str = line.strip().split('|')
+                    word, offset_str = line.strip().split('|')[:2] # split records add |hot_len
                     current_offset = int(offset_str)
                     index_dict[prev_word] = [prev_offset, current_offset - prev_offset]
                     prev_word, prev_offset = word, current_offset
@@ -83,7 +83,12 @@ def decompress_word_data(word_to_find, index_dict, data_file_path):
                  print(f"Error: No data read for word '{word_to_find}' at offset {offset} with length {length}.", file=sys.stderr)
                  return None
 
-            decompressed_str = zlib.decompress(compressed_data).decode('utf8')
+            d = zlib.decompressobj()
+            decompressed_str = d.decompress(compressed_data).decode('utf8')
+            if d.unused_data:
+                # hot/cold split record, cold fields are newline separated
+                cold = zlib.decompress(d.unused_data).decode('utf8')
+                decompressed_str = '|'.join([decompressed_str] + cold.split('\n'))
             data_parts = decompressed_str.split('|')
 
             # Expected format: word|id|pronunciation|paraphrase_json|desc_json|sentence_json
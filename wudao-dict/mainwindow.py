@@ -2,12 +2,12 @@ from PyQt5.QtCore import *
 from PyQt5.QtWidgets import *
 from PyQt5.QtGui import *
 import sys
-import json
 from urllib.error import URLError
 import socket
 
 from mainwindow_ui import Ui_MainWindow
 from src.GuiDraw import GuiDraw
+from src.JsonReader import EN_SHORT_FIELDS, ZH_SHORT_FIELDS
 from src.WudaoClient import WudaoClient
 from src.tools import is_alphabet
 from src.UserHistory import UserHistory
@@ -69,10 +69,12 @@ class MainWindow(QMainWindow):
                 self.is_zh = False
             else:
                 self.is_zh = True
-            # query on server
-            server_context = self.client.get_word_info(self.word).strip()
-            if server_context != 'None':
-                wi = json.loads(server_context)
+            # query on server, the intro mode needs no sentences
+            fields = None
+            if not self.draw_conf:
+                fields = ZH_SHORT_FIELDS if self.is_zh else EN_SHORT_FIELDS
+            wi = self.client.get_word_dict(self.word, fields=fields)
+            if wi is not None:
                 self.painter.html = ''
                 if self.is_zh:
                     self.painter.draw_zh_text(wi, self.draw_conf)
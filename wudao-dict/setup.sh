@@ -34,6 +34,9 @@ fi
 
 chmod -R 777 usr
 
+# 二进制索引和词条的布隆过滤器, 不用服务也能快速查词
+python3 -m src.BinIndex || echo "Warning: binary index not built, wd will use the server."
+
 # 添加系统命令wd
 echo '#!/bin/bash'>./wd
 echo 'save_path=$PWD'>>./wd
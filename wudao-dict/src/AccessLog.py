@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+# Request logs of WudaoServer
+#   ./usr/access.log  one json line per sampled request
+#   ./usr/slow.log    every request slower than the threshold, with per-stage timings
+# Request threads only put a tuple in a bounded queue, a background thread
+# formats, writes and rotates. When the queue is full records are dropped.
+import json
+import os
+import queue
+import random
+import threading
+import time
+
+
+# per-stage wall time of one request, in milliseconds
+class StageTimer:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.last = self.start
+        self.stages = {}
+
+    # close the current stage and start the next one
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0) + (now - self.last) * 1000
+        self.last = now
+
+    def total_ms(self):
+        return (self.last - self.start) * 1000
+
+
+class AccessLog:
+    ACCESS_FILE_NAME = './usr/access.log'
+    SLOW_FILE_NAME = './usr/slow.log'
+    QUEUE_LEN = 10000
+    MAX_BYTES = 1 << 20
+    BACKUP_COUNT = 3
+
+    # sample: fraction of requests written to the access log (0 disables it)
+    # slow_ms: requests taking at least this long go to the slow log (0 disables it)
+    def __init__(self, sample=1.0, slow_ms=50):
+        self.sample = sample
+        self.slow_ms = slow_ms
+        # records lost to a full queue, counted by request threads, reported by the writer
+        self.dropped = 0
+        self.__dropped_lock = threading.Lock()
+        self.__queue = queue.Queue(self.QUEUE_LEN)
+        self.__thread = threading.Thread(target=self.__write_loop, daemon=True)
+        self.__thread.start()
+
+    # proto: 'framed', 'legacy' or 'http'; result: reply kind or HTTP status
+    def log(self, proto, word, result, size, timer):
+        ms = timer.total_ms()
+        slow = bool(self.slow_ms) and ms >= self.slow_ms
+        sampled = bool(self.sample) and random.random() < self.sample
+        if not slow and not sampled:
+            return
+        try:
+            self.__queue.put_nowait((time.time(), proto, word, result, size, ms, timer.stages, slow, sampled))
+        except queue.Full:
+            with self.__dropped_lock:
+                self.dropped += 1
+
+    # write what is queued and stop the writer
+    def close(self):
+        self.__queue.put(None)
+        self.__thread.join(2)
+
+    def __write_loop(self):
+        files = {}
+        while True:
+            batch = [self.__queue.get()]
+            while len(batch) < 256:
+                try:
+                    batch.append(self.__queue.get_nowait())
+                except queue.Empty:
+                    break
+            access, slow, stop = [], [], False
+            for item in batch:
+                if item is None:
+                    stop = True
+                    continue
+                ts, proto, word, result, size, ms, stages, is_slow, sampled = item
+                rec = {'ts': round(ts, 3), 'proto': proto, 'q': word, 'result': result,
+                       'bytes': size, 'ms': round(ms, 3)}
+                if is_slow:
+                    slow_rec = dict(rec)
+                    slow_rec['stages'] = {k: round(v, 3) for k, v in stages.items()}
+                    slow.append(json.dumps(slow_rec, ensure_ascii=False))
+                if sampled:
+                    access.append(json.dumps(rec, ensure_ascii=False))
+            with self.__dropped_lock:
+                dropped, self.dropped = self.dropped, 0
+            if dropped:
+                access.append(json.dumps({'ts': round(time.time(), 3), 'dropped': dropped}))
+            for name, lines in ((self.ACCESS_FILE_NAME, access), (self.SLOW_FILE_NAME, slow)):
+                if lines:
+                    self.__write(files, name, lines)
+            if stop:
+                break
+        for f in files.values():
+            f.close()
+
+    def __write(self, files, name, lines):
+        try:
+            f = files.get(name)
+            if f is None:
+                f = files[name] = open(name, 'a', encoding='utf-8')
+            f.write('\n'.join(lines) + '\n')
+            f.flush()
+            if f.tell() >= self.MAX_BYTES:
+                f.close()
+                del files[name]
+                self.__rotate(name)
+        except OSError:
+            # logging must never take the server down
+            files.pop(name, None)
+
+    # name -> name.1 -> ... -> name.BACKUP_COUNT
+    def __rotate(self, name):
+        for i in range(self.BACKUP_COUNT - 1, 0, -1):
+            if os.path.exists('%s.%d' % (name, i)):
+                os.replace('%s.%d' % (name, i), '%s.%d' % (name, i + 1))
+        os.replace(name, name + '.1')
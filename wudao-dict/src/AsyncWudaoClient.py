@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+# asyncio client of WudaoServer for bots and web services
+#
+#     async with AsyncWudaoClient(max_connections=8) as client:
+#         info = await client.get_word_dict('hello')
+#         infos = await client.get_words_dict(['take off', '词典'])
+#
+# Connections are kept in a pool of at most max_connections, each carries one request
+# at a time; a lookup waits for a free one. Every request has to be answered within
+# `timeout` seconds. A request that fails on the connection is retried `retries` times
+# on a new one; requests with `track` are not, they would be counted twice.
+import asyncio
+import os
+import socket
+
+from .WudaoClient import WudaoClient
+from .protocol import HEADER
+from .protocol import encode_request
+from .protocol import ServerUnavailable
+
+
+class AsyncWudaoClient:
+    UNIX_SOCKET_PATH = WudaoClient.UNIX_SOCKET_PATH
+
+    def __init__(self, max_connections=8, timeout=5.0, retries=2):
+        self.timeout = timeout
+        self.retries = retries
+        self.token = os.environ.get('WUDAO_TOKEN')
+        self.__slots = asyncio.Semaphore(max_connections)
+        # idle (reader, writer) pairs, the last used first
+        self.__idle = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    # close the idle connections, the server keeps running
+    async def close(self):
+        idle, self.__idle = self.__idle, []
+        for _, writer in idle:
+            writer.close()
+        for _, writer in idle:
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+    async def __connect(self):
+        if hasattr(socket, 'AF_UNIX') and WudaoClient.is_trusted_socket(self.UNIX_SOCKET_PATH):
+            try:
+                return await asyncio.open_unix_connection(self.UNIX_SOCKET_PATH)
+            except OSError:
+                pass
+        reader, writer = await asyncio.open_connection('127.0.0.1', 23764)
+        writer.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return reader, writer
+
+    @staticmethod
+    async def __exchange(conn, data):
+        reader, writer = conn
+        writer.write(data)
+        await writer.drain()
+        kind, length = HEADER.unpack(await reader.readexactly(HEADER.size))
+        return kind, await reader.readexactly(length) if length else b''
+
+    # send one framed request, return (kind, body)
+    async def request(self, req):
+        if self.token:
+            req['token'] = self.token
+        data = encode_request(req)
+        attempts = 1 if 'track' in req else self.retries + 1
+        error = None
+        async with self.__slots:
+            for attempt in range(attempts):
+                if attempt:
+                    await asyncio.sleep(0.01 * attempt)
+                conn = self.__idle.pop() if self.__idle else None
+                try:
+                    if conn is None:
+                        conn = await asyncio.wait_for(self.__connect(), self.timeout)
+                    reply = await asyncio.wait_for(self.__exchange(conn, data), self.timeout)
+                except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+                    # the reply may still come, the connection cannot be used again
+                    if conn is not None:
+                        conn[1].close()
+                    error = e
+                    continue
+                except BaseException:
+                    # cancelled half way through
+                    if conn is not None:
+                        conn[1].close()
+                    raise
+                self.__idle.append(conn)
+                return reply
+        raise ServerUnavailable('Error: no answer from the Wudao server (%s)' % (error or 'timeout'))
+
+    # return dict of word info (only `fields` if given), or None
+    async def get_word_dict(self, word, fields=None, online=False, raw=True):
+        req = WudaoClient.dict_request(word, raw, fields, online)
+        return WudaoClient.parse_dict(req['q'], fields, *await self.request(req))
+
+    # return (meta dict, rendered terminal text as bytes), or None
+    async def get_word_rendered(self, word, short, color=True, online=False, track=None):
+        req = WudaoClient.render_request(word, short, color, online, track)
+        return WudaoClient.parse_rendered(*await self.request(req))
+
+    # dictionary words starting with prefix, in lexical order
+    async def get_prefix_words(self, prefix, limit=20):
+        return WudaoClient.parse_prefix(*await self.request({'prefix': prefix, 'limit': limit}))
+
+    # get_word_dict of each word, in order; as many at once as there are connections
+    async def get_words_dict(self, words, fields=None, online=False, raw=True):
+        return await asyncio.gather(*(self.get_word_dict(word, fields, online, raw) for word in words))
+
+    async def get_words_rendered(self, words, short, color=True, online=False):
+        return await asyncio.gather(*(self.get_word_rendered(word, short, color, online) for word in words))
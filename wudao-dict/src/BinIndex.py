@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+# Sorted binary index (en.idx / zh.idx), searched directly in an mmap
+#
+# The text index (en.ind) must be read and parsed completely before the first
+# lookup. This one is used as it is on disk, so opening it costs one mmap.
+#   header   MAGIC, count (uint32)
+#   entries  count * (key offset, key length, data offset, data length, hot length), uint32 each,
+#            sorted by the utf-8 bytes of the word
+#   keys     utf-8 words
+# Build it next to the text index (with dict/words.bloom) by
+#     python3 -m src.BinIndex          (in the wudao-dict directory)
+import mmap
+import os
+import struct
+import sys
+
+MAGIC = b'WDIDX1\0\0'
+HEADER = struct.Struct('<8sI')
+ENTRY = struct.Struct('<IIIII')
+
+
+# entries: {word: (offset, length, hot_len)}
+def write_bin_index(entries, file_name):
+    keys = sorted(w.encode('utf-8') for w in entries)
+    key_base = HEADER.size + ENTRY.size * len(keys)
+    table = bytearray()
+    blob = bytearray()
+    for key in keys:
+        offset, length, hot_len = entries[key.decode('utf-8')]
+        table += ENTRY.pack(key_base + len(blob), len(key), offset, length, hot_len)
+        blob += key
+    with open(file_name + '.tmp', 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(keys)))
+        f.write(table)
+        f.write(blob)
+    os.replace(file_name + '.tmp', file_name)
+
+
+# read-only mapping word -> (offset, length, hot_len), iterates in sorted order
+class BinIndex:
+    def __init__(self, file_name):
+        with open(file_name, 'rb') as f:
+            self.__map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.__count = HEADER.unpack_from(self.__map, 0)
+        if magic != MAGIC:
+            raise ValueError('%s is not a binary index' % file_name)
+
+    def __len__(self):
+        return self.__count
+
+    def __key(self, i):
+        key_off, key_len = struct.unpack_from('<II', self.__map, HEADER.size + ENTRY.size * i)
+        return self.__map[key_off:key_off + key_len]
+
+    # first position whose key is >= key
+    def __bisect(self, key):
+        lo, hi = 0, self.__count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.__key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def get(self, word, default=None):
+        key = word.encode('utf-8')
+        i = self.__bisect(key)
+        if i < self.__count and self.__key(i) == key:
+            return ENTRY.unpack_from(self.__map, HEADER.size + ENTRY.size * i)[2:]
+        return default
+
+    def __getitem__(self, word):
+        res = self.get(word)
+        if res is None:
+            raise KeyError(word)
+        return res
+
+    def __contains__(self, word):
+        return self.get(word) is not None
+
+    def __iter__(self):
+        for i in range(self.__count):
+            yield self.__key(i).decode('utf-8')
+
+    # words starting with prefix, in lexical order
+    def prefix(self, prefix, limit=20):
+        key = prefix.encode('utf-8')
+        res = []
+        i = self.__bisect(key)
+        while i < self.__count and len(res) < limit:
+            word = self.__key(i)
+            if not word.startswith(key):
+                break
+            res.append(word.decode('utf-8'))
+            i += 1
+        return res
+
+
+# en.ind/zh.ind -> en.idx/zh.idx, and the bloom filter of both (see src/BloomFilter.py)
+def main():
+    from .BloomFilter import FILE_NAME as BLOOM_FILE_NAME
+    from .BloomFilter import write_bloom_filter
+    from .JsonReader import JsonReader
+    reader = JsonReader(bin_index=False)
+    for index, file_name in ((reader.index_dict, reader.BIN_INDEX_FILE_NAME),
+                             (reader.zh_index_dict, reader.ZH_BIN_INDEX_FILE_NAME)):
+        write_bin_index(index, file_name)
+        print('%s: %d words' % (file_name, len(index)))
+    write_bloom_filter(list(reader.index_dict) + list(reader.zh_index_dict), BLOOM_FILE_NAME)
+    print('%s: %d words' % (BLOOM_FILE_NAME, len(reader.index_dict) + len(reader.zh_index_dict)))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
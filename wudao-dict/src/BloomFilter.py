@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+# Bloom filter of all headwords (dict/words.bloom), mmapped by clients to skip lookups of
+# words that are certainly not in the dictionary
+#
+# A dictionary word is always in the filter, another word only with a probability of
+# about 1% (10 bits per word, 7 hashes).
+#   header  MAGIC, number of bits, number of hashes, number of words (uint32 each)
+#   bits    bit i is bit i % 8 of byte i // 8
+# English words are kept lower case, like the index. Built together with the
+# binary indexes by
+#     python3 -m src.BinIndex          (in the wudao-dict directory)
+import mmap
+import os
+import struct
+import zlib
+
+MAGIC = b'WDBLM1\0\0'
+HEADER = struct.Struct('<8sIII')
+FILE_NAME = './dict/words.bloom'
+BITS_PER_WORD = 10
+HASHES = 7
+
+
+# the k bit positions of a word (double hashing)
+def _positions(word, num_bits, k):
+    key = word.encode('utf-8')
+    h1 = zlib.crc32(key)
+    h2 = zlib.crc32(key, 0x9747b28c) | 1
+    return [(h1 + i * h2) % num_bits for i in range(k)]
+
+
+def write_bloom_filter(words, file_name=FILE_NAME, bits_per_word=BITS_PER_WORD, k=HASHES):
+    words = list(words)
+    num_bits = max(64, len(words) * bits_per_word)
+    bits = bytearray((num_bits + 7) // 8)
+    for word in words:
+        for pos in _positions(word, num_bits, k):
+            bits[pos >> 3] |= 1 << (pos & 7)
+    with open(file_name + '.tmp', 'wb') as f:
+        f.write(HEADER.pack(MAGIC, num_bits, k, len(words)))
+        f.write(bits)
+    os.replace(file_name + '.tmp', file_name)
+
+
+class BloomFilter:
+    def __init__(self, file_name=FILE_NAME):
+        with open(file_name, 'rb') as f:
+            self.__map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.__num_bits, self.__k, self.__count = HEADER.unpack_from(self.__map, 0)
+        if magic != MAGIC:
+            raise ValueError('%s is not a bloom filter' % file_name)
+
+    def __len__(self):
+        return self.__count
+
+    # False: certainly not a dictionary word, True: most likely one
+    def __contains__(self, word):
+        data = self.__map
+        for pos in _positions(word, self.__num_bits, self.__k):
+            if not data[HEADER.size + (pos >> 3)] & (1 << (pos & 7)):
+                return False
+        return True
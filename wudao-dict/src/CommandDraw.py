@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 from __future__ import print_function
 import os
+import sys
 
 class CommandDraw:
     RED_PATTERN = '\033[31m%s\033[0m'
@@ -8,6 +9,12 @@ class CommandDraw:
     BLUE_PATTERN = '\033[34m%s\033[0m'
     PEP_PATTERN = '\033[36m%s\033[0m'
     BROWN_PATTERN = '\033[33m%s\033[0m'
+
+    def __init__(self, color=True):
+        self.color = color
+        if not color:
+            self.RED_PATTERN = self.GREEN_PATTERN = self.BLUE_PATTERN = '%s'
+            self.PEP_PATTERN = self.BROWN_PATTERN = '%s'
     
     @staticmethod
     def beautiy_print(text):
@@ -34,8 +41,16 @@ class CommandDraw:
             print(text)
     
     def draw_text(self, word, conf):
+        sys.stdout.write(self.render_text(word, conf))
+
+    def draw_zh_text(self, word, conf):
+        sys.stdout.write(self.render_zh_text(word, conf))
+
+    # return the text draw_text prints
+    def render_text(self, word, conf):
+        out = []
         # Word
-        print(self.RED_PATTERN % word['word'])
+        out.append(self.RED_PATTERN % word['word'] + '\n')
         # pronunciation
         if word['pronunciation']:
             uncommit = ''
@@ -45,28 +60,28 @@ class CommandDraw:
                 uncommit += u'美 ' + self.PEP_PATTERN % word['pronunciation']['美']
             if '' in word['pronunciation']:
                 uncommit = u'英/美 ' + self.PEP_PATTERN % word['pronunciation']['']
-            print(uncommit)
+            out.append(uncommit + '\n')
         # paraphrase
         for v in word['paraphrase']:
-            print(v)
+            out.append(v + '\n')
         # short desc
         if word['rank']:
-            print(self.RED_PATTERN % word['rank'], end='  ')
+            out.append(self.RED_PATTERN % word['rank'] + '  ')
         if word['pattern']:
-            print(self.RED_PATTERN % word['pattern'].strip())
+            out.append(self.RED_PATTERN % word['pattern'].strip() + '\n')
         # sentence
         if conf['short']:
-            print('')
+            out.append('\n')
         else:
             count = 1
             if word['sentence']:
-                print('')
+                out.append('\n')
                 if len(word['sentence'][0]) == 2:
                     collins_flag = False
                 else:
                     collins_flag = True
             else:
-                return
+                return ''.join(out)
             for v in word['sentence']:
                 if collins_flag:
                     # collins dict
@@ -83,57 +98,61 @@ class CommandDraw:
                     for sv in v[2]:
                         sentence_t += self.GREEN_PATTERN % u'  例: ' + self.BROWN_PATTERN % (sv[0] + sv[1]) + '\n'
                     count += 1
-                    print(sentence_t)
+                    out.append(sentence_t + '\n')
                 else:
                     # 21 new year dict
                     if len(v) != 2:
                         continue
-                    print(str(count) + '. ' + self.GREEN_PATTERN % '[例]', end=' ')
-                    print(v[0], end='  ')
-                    print(self.BROWN_PATTERN % v[1])
+                    out.append(str(count) + '. ' + self.GREEN_PATTERN % '[例]' + ' ')
+                    out.append(v[0] + '  ')
+                    out.append(self.BROWN_PATTERN % v[1] + '\n')
                     count += 1
+        return ''.join(out)
 
-    def draw_zh_text(self, word, conf):
+    # return the text draw_zh_text prints
+    def render_zh_text(self, word, conf):
+        out = []
         # Word
-        print(self.RED_PATTERN % word['word'])
+        out.append(self.RED_PATTERN % word['word'] + '\n')
         # pronunciation
         if word['pronunciation']:
-            print(self.PEP_PATTERN % word['pronunciation'])
+            out.append(self.PEP_PATTERN % word['pronunciation'] + '\n')
         # paraphrase
         if word['paraphrase']:
             for v in word['paraphrase']:
                 v = v.replace('  ;  ', ', ')
-                print(v)
+                out.append(v + '\n')
         # complex
         if not conf['short']:
             # description
             count = 1
             if word["desc"]:
-                print('')
+                out.append('\n')
                 for v in word['desc']:
                     if not v:
                         continue
                     # sub title
-                    print(str(count) + '. ', end='')
-                    v[0] = v[0].replace(';', ',')
-                    print(self.GREEN_PATTERN % v[0])
+                    out.append(str(count) + '. ')
+                    title = v[0].replace(';', ',')
+                    out.append(self.GREEN_PATTERN % title + '\n')
                     # sub example
                     sub_count = 0
                     if len(v) == 2:
                         for e in v[1]:
                             if sub_count % 2 == 0:
                                 e = e.strip().replace(';', '')
-                                print(self.BROWN_PATTERN % ('    ' + e + '    '), end='')
+                                out.append(self.BROWN_PATTERN % ('    ' + e + '    '))
                             else:
-                                print(e)
+                                out.append(e + '\n')
                             sub_count += 1
                     count += 1
             # example
             if word['sentence']:
                 count = 1
-                print(self.RED_PATTERN % '\n例句:')
+                out.append(self.RED_PATTERN % '\n例句:' + '\n')
                 for v in word['sentence']:
                     if len(v) == 2:
-                        print('')
-                        print(str(count) + '. ' + self.BROWN_PATTERN % v[0] + '    '+ v[1])
+                        out.append('\n')
+                        out.append(str(count) + '. ' + self.BROWN_PATTERN % v[0] + '    '+ v[1] + '\n')
                     count += 1
+        return ''.join(out)
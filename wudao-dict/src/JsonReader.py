@@ -1,82 +1,260 @@
 # -*- coding: utf-8 -*-
+import bisect
+import mmap
+import os
 import zlib
 import json
 
+from .BinIndex import BinIndex
+
+# fields the short (no sentence) display modes need
+EN_SHORT_FIELDS = frozenset(('word', 'pronunciation', 'paraphrase', 'rank', 'pattern'))
+ZH_SHORT_FIELDS = frozenset(('word', 'pronunciation', 'paraphrase'))
+# Records come in two formats:
+#   legacy: one zlib stream of all fields joined by '|'
+#   split:  a zlib stream of the hot fields joined by '|', followed by a
+#           zlib stream of the cold fields (json) joined by '\n'.
+#           The index line is word|offset|hot_len.
+EN_COLD_FIELDS = frozenset(('sentence',))
+ZH_COLD_FIELDS = frozenset(('desc', 'sentence'))
+
+
+# keep only the requested fields, None means all
+def project(word, fields):
+    if fields is None:
+        return word
+    return {k: v for k, v in word.items() if k in fields}
+
+
+# True if `fields` asks for any of the cold fields
+def needs_cold(fields, cold_fields):
+    return fields is None or not cold_fields.isdisjoint(fields)
+
+
+# compressed en.z record -> dict, json fields outside `fields` are not decoded
+def decode_en_record(bytes_obj, fields=None):
+    d = zlib.decompressobj()
+    list_obj = d.decompress(bytes_obj).decode('utf8').split('|', 8)
+    if len(list_obj) == 8:
+        # split record, the sentences are in the second stream (if it was sent at all)
+        cold = ''
+        if d.unused_data and needs_cold(fields, EN_COLD_FIELDS):
+            cold = zlib.decompress(d.unused_data).decode('utf8')
+        list_obj.append(cold)
+    word = {}
+    word['word'] = list_obj[0]
+    word['id'] = list_obj[1]
+    word['pronunciation'] = {}
+    if list_obj[2]:
+        word['pronunciation']['美'] = list_obj[2]
+    if list_obj[3]:
+        word['pronunciation']['英'] = list_obj[3]
+    if list_obj[4]:
+        word['pronunciation'][''] = list_obj[4]
+    if fields is None or 'paraphrase' in fields:
+        word['paraphrase'] = json.loads(list_obj[5])
+    word['rank'] = list_obj[6]
+    word['pattern'] = list_obj[7]
+    if fields is None or 'sentence' in fields:
+        word['sentence'] = []
+        if list_obj[8]:
+            word['sentence'] = json.loads(list_obj[8])
+    return project(word, fields)
+
+
+# compressed zh.z record -> dict, json fields outside `fields` are not decoded
+def decode_zh_record(bytes_obj, fields=None):
+    d = zlib.decompressobj()
+    list_obj = d.decompress(bytes_obj).decode('utf8').split('|', 5)
+    if len(list_obj) == 4:
+        # split record, desc and sentences are in the second stream
+        cold = ['', '']
+        if d.unused_data and needs_cold(fields, ZH_COLD_FIELDS):
+            cold = zlib.decompress(d.unused_data).decode('utf8').split('\n')
+        list_obj += cold
+    word = {}
+    word['word'] = list_obj[0]
+    word['id'] = list_obj[1]
+    word['pronunciation'] = ''
+    if list_obj[2]:
+        word['pronunciation'] = list_obj[2]
+    if fields is None or 'paraphrase' in fields:
+        word['paraphrase'] = json.loads(list_obj[3])
+    if fields is None or 'desc' in fields:
+        word['desc'] = []
+        if list_obj[4]:
+            word['desc'] = json.loads(list_obj[4])
+    if fields is None or 'sentence' in fields:
+        word['sentence'] = []
+        if list_obj[5]:
+            word['sentence'] = json.loads(list_obj[5])
+    return project(word, fields)
+
+
 class JsonReader:
-    def __init__(self):
+    # bin_index: use the binary indexes (see src/BinIndex.py) when they are up to date
+    def __init__(self, bin_index=True):
         self.__main_dict = {}
         self.FILE_NAME = './dict/en.z'
         self.INDEX_FILE_NAME = './dict/en.ind'
+        self.BIN_INDEX_FILE_NAME = './dict/en.idx'
         self.ZH_FILE_NAME = './dict/zh.z'
         self.ZH_INDEX_FILE_NAME = './dict/zh.ind'
-        self.__index_dict = {}
-        self.__zh_index_dict = {}
-        with open(self.INDEX_FILE_NAME, 'r') as f:
-            lines = f.readlines()
-            prev_word, prev_no = lines[0].split('|')
-            for v in lines[1:]:
-                word, no = v.split('|')
-                self.__index_dict[prev_word] = (int(prev_no), int(no) - int(prev_no))
-                prev_word, prev_no = word, no
-            self.__index_dict[word] = (int(no), f.tell() - int(no))
-        with open(self.ZH_INDEX_FILE_NAME, 'r') as f:
+        self.ZH_BIN_INDEX_FILE_NAME = './dict/zh.idx'
+        # data files are mapped once, records are served as slices of the map
+        self.__data = self.__map_file(self.FILE_NAME)
+        self.__zh_data = self.__map_file(self.ZH_FILE_NAME)
+        self.__index_dict = self.__load_index(self.INDEX_FILE_NAME, self.BIN_INDEX_FILE_NAME,
+                                              len(self.__data), bin_index)
+        self.__zh_index_dict = self.__load_index(self.ZH_INDEX_FILE_NAME, self.ZH_BIN_INDEX_FILE_NAME,
+                                                 len(self.__zh_data), bin_index)
+        # sorted word lists for prefix search, built on first use
+        self.__sorted_words = None
+        self.__zh_sorted_words = None
+        self.__file_stats = self.__get_file_stats()
+        self.__build_id = None
+
+    @staticmethod
+    def __map_file(name):
+        with open(name, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b''
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    # True if the binary indexes are used, lookups need no index parsing then
+    @staticmethod
+    def has_bin_index(name, bin_name):
+        try:
+            return os.stat(bin_name).st_mtime >= os.stat(name).st_mtime
+        except OSError:
+            return False
+
+    def __load_index(self, name, bin_name, data_len, bin_index):
+        if bin_index and self.has_bin_index(name, bin_name):
+            return BinIndex(bin_name)
+        return self.__read_index(name, data_len)
+
+    @property
+    def index_dict(self):
+        return self.__index_dict
+
+    @property
+    def zh_index_dict(self):
+        return self.__zh_index_dict
+
+    # word -> (offset, length, hot_len), hot_len is 0 for legacy records
+    @staticmethod
+    def __read_index(name, data_len):
+        index_dict = {}
+        with open(name, 'r') as f:
             lines = f.readlines()
-            prev_word, prev_no = lines[0].split('|')
-            for v in lines[1:]:
-                word, no = v.split('|')
-                self.__zh_index_dict[prev_word] = (int(prev_no), int(no) - int(prev_no))
-                prev_word, prev_no = word, no
-            self.__zh_index_dict[word] = (int(no), f.tell() - int(no))
+        prev = lines[0].rstrip('\n').split('|')
+        for v in lines[1:]:
+            cur = v.rstrip('\n').split('|')
+            index_dict[prev[0]] = (int(prev[1]), int(cur[1]) - int(prev[1]),
+                                   int(prev[2]) if len(prev) > 2 else 0)
+            prev = cur
+        # the last record runs to the end of the data file
+        if prev[0] != '__EOF__':
+            index_dict[prev[0]] = (int(prev[1]), data_len - int(prev[1]),
+                                   int(prev[2]) if len(prev) > 2 else 0)
+        return index_dict
+
+    # sizes and mtimes of the dictionary files when they were opened
+    def __get_file_stats(self):
+        stats = ''
+        for name in (self.FILE_NAME, self.INDEX_FILE_NAME, self.ZH_FILE_NAME, self.ZH_INDEX_FILE_NAME):
+            try:
+                st = os.stat(name)
+                stats += '%s:%d:%d;' % (name, st.st_size, int(st.st_mtime))
+            except OSError:
+                stats += '%s:-;' % name
+        return stats
+
+    # identifies the dictionary files currently loaded (used for ETags),
+    # hashed on first use so that only the HTTP server imports hashlib
+    @property
+    def build_id(self):
+        if self.__build_id is None:
+            import hashlib
+            self.__build_id = hashlib.md5(self.__file_stats.encode('utf-8')).hexdigest()[:16]
+        return self.__build_id
+
+    # ask the kernel to read the data files into the page cache ahead of use
+    def prefetch(self):
+        if not hasattr(mmap, 'MADV_WILLNEED'):
+            return
+        for data in (self.__data, self.__zh_data):
+            if isinstance(data, mmap.mmap):
+                data.madvise(mmap.MADV_WILLNEED)
+
+    def has_word(self, query_word, zh=False):
+        if zh:
+            return query_word in self.__zh_index_dict
+        return query_word in self.__index_dict
+
+    # return compressed record as a memoryview of the data file (no copy),
+    # hot_only: only the hot region of split records
+    def get_word_raw(self, query_word, hot_only=False):
+        entry = self.__index_dict.get(query_word)
+        if entry is None:
+            return None
+        offset, length, hot_len = entry
+        if hot_only and hot_len:
+            length = hot_len
+        return memoryview(self.__data)[offset:offset + length]
+
+    def get_zh_word_raw(self, query_word, hot_only=False):
+        entry = self.__zh_index_dict.get(query_word)
+        if entry is None:
+            return None
+        offset, length, hot_len = entry
+        if hot_only and hot_len:
+            length = hot_len
+        return memoryview(self.__zh_data)[offset:offset + length]
+
+    # return dict of word info, only `fields` if given
+    def get_word_dict(self, query_word, fields=None):
+        bytes_obj = self.get_word_raw(query_word, not needs_cold(fields, EN_COLD_FIELDS))
+        if bytes_obj is None:
+            return None
+        return decode_en_record(bytes_obj, fields)
+
+    def get_zh_word_dict(self, query_word, fields=None):
+        bytes_obj = self.get_zh_word_raw(query_word, not needs_cold(fields, ZH_COLD_FIELDS))
+        if bytes_obj is None:
+            return None
+        return decode_zh_record(bytes_obj, fields)
 
     # return strings of word info
-    def get_word_info(self, query_word):
-        with open(self.FILE_NAME, 'rb') as f:
-            if query_word in self.__index_dict:
-                word_offset = self.__index_dict[query_word]
-                f.seek(word_offset[0])
-                bytes_obj = f.read(word_offset[1])
-                str_obj = zlib.decompress(bytes_obj).decode('utf8')
-                list_obj = str_obj.split('|')
-                word = {}
-                word['word'] = list_obj[0]
-                word['id'] = list_obj[1]
-                word['pronunciation'] = {}
-                if list_obj[2]:
-                    word['pronunciation']['美'] = list_obj[2]
-                if list_obj[3]:
-                    word['pronunciation']['英'] = list_obj[3]
-                if list_obj[4]:
-                    word['pronunciation'][''] = list_obj[4]
-                word['paraphrase'] = json.loads(list_obj[5])
-                word['rank'] = list_obj[6]
-                word['pattern'] = list_obj[7]
-                word['sentence'] = json.loads(list_obj[8])
-                return json.dumps(word)
-            else:
-                return None
-
-    def get_zh_word_info(self, query_word):
-        with open(self.ZH_FILE_NAME, 'rb') as f:
-            if query_word in self.__zh_index_dict:
-                word_offset = self.__zh_index_dict[query_word]
-                f.seek(word_offset[0])
-                bytes_obj = f.read(word_offset[1])
-                str_obj = zlib.decompress(bytes_obj).decode('utf8')
-                list_obj = str_obj.split('|')
-                word = {}
-                word['word'] = list_obj[0]
-                word['id'] = list_obj[1]
-                word['pronunciation'] = ''
-                if list_obj[2]:
-                    word['pronunciation'] = list_obj[2]
-                word['paraphrase'] = json.loads(list_obj[3])
-                word['desc'] = []
-                if list_obj[4]:
-                    word['desc'] = json.loads(list_obj[4])
-                word['sentence'] = []
-                if list_obj[5]:
-                    word['sentence'] = json.loads(list_obj[5])
-                return json.dumps(word)
-            else:
-                return None
+    def get_word_info(self, query_word, fields=None):
+        word = self.get_word_dict(query_word, fields)
+        if word is None:
+            return None
+        return json.dumps(word)
+
+    def get_zh_word_info(self, query_word, fields=None):
+        word = self.get_zh_word_dict(query_word, fields)
+        if word is None:
+            return None
+        return json.dumps(word)
 
+    # words starting with prefix, in lexical order
+    def get_prefix_words(self, prefix, limit=20, zh=False):
+        index = self.__zh_index_dict if zh else self.__index_dict
+        if isinstance(index, BinIndex):
+            return index.prefix(prefix, limit)
+        if zh:
+            if self.__zh_sorted_words is None:
+                self.__zh_sorted_words = sorted(self.__zh_index_dict)
+            words = self.__zh_sorted_words
+        else:
+            if self.__sorted_words is None:
+                self.__sorted_words = sorted(self.__index_dict)
+            words = self.__sorted_words
+        res = []
+        i = bisect.bisect_left(words, prefix)
+        while i < len(words) and len(res) < limit and words[i].startswith(prefix):
+            res.append(words[i])
+            i += 1
+        return res
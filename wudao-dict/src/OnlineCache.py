@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import threading
+
+
+# online search results, shared by every client of one server
+class OnlineCache:
+    MAX_CACHE_LEN = 10000
+    CACHE_FILE_NAME = './usr/online_cache.json'
+
+    def __init__(self, file_name=None):
+        if file_name:
+            self.CACHE_FILE_NAME = file_name
+        self.__lock = threading.Lock()
+        try:
+            with open(self.CACHE_FILE_NAME, 'r') as f:
+                self.__cache_dic = json.load(f)
+        except (OSError, ValueError):
+            self.__cache_dic = {}
+
+    def get(self, word):
+        with self.__lock:
+            return self.__cache_dic.get(word.lower())
+
+    def put(self, word_info):
+        with self.__lock:
+            # too much usr word
+            if len(self.__cache_dic) > self.MAX_CACHE_LEN:
+                self.__cache_dic = {}
+            self.__cache_dic[word_info['word'].lower()] = word_info
+            # clients may read the file, never leave it half written
+            tmp_name = self.CACHE_FILE_NAME + '.tmp'
+            with open(tmp_name, 'w') as f:
+                json.dump(self.__cache_dic, f)
+            os.replace(tmp_name, self.CACHE_FILE_NAME)
+
+    def __len__(self):
+        return len(self.__cache_dic)
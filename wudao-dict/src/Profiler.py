@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+# Profile a running WudaoServer, results are written to ./usr/
+#   sample    a background thread samples the stacks of all threads,
+#             written as collapsed stacks (flamegraph.pl / speedscope input)
+#   cprofile  requests run under cProfile, one at a time: Python 3.12+ allows
+#             only one active profiler per process. Every request gets a
+#             profile and they are merged at stop.
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+import traceback
+
+
+class Profiler:
+    USR_DIR = './usr'
+    SAMPLE_INTERVAL = 0.005
+    # how long a request waits for its turn under cProfile before it runs without
+    CALL_WAIT = 1.0
+
+    def __init__(self):
+        self.mode = None
+        self.__lock = threading.Lock()
+        # held by the request running under cProfile
+        self.__call_lock = threading.Lock()
+        self.__stop_event = threading.Event()
+        self.__thread = None
+        self.__samples = {}
+        self.__profiles = []
+
+    def __file_name(self, prefix, ext):
+        return os.path.join(self.USR_DIR, '%s-%s.%s' % (prefix, time.strftime('%Y%m%d-%H%M%S'), ext))
+
+    def start(self, mode='sample'):
+        with self.__lock:
+            if self.mode:
+                raise ValueError('profiler already running (%s)' % self.mode)
+            if mode not in ('sample', 'cprofile'):
+                raise ValueError('bad profiler mode: %s' % mode)
+            self.mode = mode
+            self.__samples = {}
+            self.__profiles = []
+            if mode == 'sample':
+                self.__stop_event.clear()
+                self.__thread = threading.Thread(target=self.__sample_loop, daemon=True)
+                self.__thread.start()
+
+    # stop and write the results, return the file name
+    def stop(self):
+        with self.__lock:
+            if not self.mode:
+                raise ValueError('profiler not running')
+            mode, self.mode = self.mode, None
+        if mode == 'sample':
+            self.__stop_event.set()
+            self.__thread.join()
+            file_name = self.__file_name('profile', 'folded')
+            with open(file_name, 'w') as f:
+                for stack, count in sorted(self.__samples.items(), key=lambda x: -x[1]):
+                    f.write('%s %d\n' % (stack, count))
+            return file_name
+        file_name = self.__file_name('profile', 'pstats')
+        if not self.__profiles:
+            # no request came in, still leave an (empty) stats file behind
+            self.__profiles.append(cProfile.Profile())
+        stats = pstats.Stats(self.__profiles[0])
+        for p in self.__profiles[1:]:
+            stats.add(p)
+        stats.dump_stats(file_name)
+        return file_name
+
+    # start if stopped, stop if running; return (running, file name or None)
+    def toggle(self, mode='sample'):
+        if self.mode:
+            return False, self.stop()
+        self.start(mode)
+        return True, None
+
+    # fn(*args), under cProfile while a cprofile session runs. Without a profiler if another
+    # request keeps it busy (a legacy one waits for its client) or another tool is active.
+    def call(self, fn, *args):
+        if self.mode != 'cprofile' or not self.__call_lock.acquire(timeout=self.CALL_WAIT):
+            return fn(*args)
+        try:
+            p = cProfile.Profile()
+            try:
+                p.enable()
+            except ValueError:
+                # e.g. a debugger: Another profiling tool is already active
+                return fn(*args)
+            try:
+                return fn(*args)
+            finally:
+                p.disable()
+                with self.__lock:
+                    self.__profiles.append(p)
+        finally:
+            self.__call_lock.release()
+
+    def __sample_loop(self):
+        me = threading.get_ident()
+        while not self.__stop_event.wait(self.SAMPLE_INTERVAL):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append('%s (%s:%d)' % (code.co_name, os.path.basename(code.co_filename),
+                                                 code.co_firstlineno))
+                    frame = frame.f_back
+                stack.append(names.get(ident, 'thread-%d' % ident))
+                key = ';'.join(reversed(stack))
+                self.__samples[key] = self.__samples.get(key, 0) + 1
+
+    # current stack of every thread, return the file name
+    def dump_stacks(self):
+        file_name = self.__file_name('stacks', 'txt')
+        names = {t.ident: t.name for t in threading.enumerate()}
+        with open(file_name, 'w') as f:
+            for ident, frame in sys._current_frames().items():
+                f.write('Thread %s (%d):\n' % (names.get(ident, '?'), ident))
+                f.write(''.join(traceback.format_stack(frame)))
+                f.write('\n')
+        return file_name
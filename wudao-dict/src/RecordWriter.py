@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+# Machine readable output of wd --format, one record per looked up word
+#   jsonl  {"query": "hello", "entry": {...}} per line, entry is null if the word was not found
+#          and holds the fields of the dictionary record (see src/JsonReader.py)
+#   json   the same records as one json array
+#   tsv    a header line, then query, word, pronunciations (美, 英, other or pinyin) and the
+#          paraphrases joined with ' | '. Tabs, line breaks and runs of spaces in values
+#          become one space; for a word not found all but the query are empty.
+import json
+
+FORMATS = ('json', 'jsonl', 'tsv')
+TSV_COLUMNS = ('query', 'word', 'us', 'uk', 'pron', 'paraphrase')
+# fields tsv rows are made of, the others need not be decoded
+TSV_FIELDS = frozenset(('word', 'pronunciation', 'paraphrase'))
+
+
+class RecordWriter:
+    def __init__(self, fmt, out):
+        if fmt not in FORMATS:
+            raise ValueError('Unknown format: %s (one of %s)' % (fmt, ', '.join(FORMATS)))
+        self.fmt = fmt
+        self.out = out
+        self.count = 0
+        if fmt == 'tsv':
+            out.write('\t'.join(TSV_COLUMNS) + '\n')
+
+    # fields to look up for this format, None means all
+    @property
+    def fields(self):
+        return TSV_FIELDS if self.fmt == 'tsv' else None
+
+    def write(self, query, entry):
+        if self.fmt == 'tsv':
+            self.out.write(self.tsv_row(query, entry))
+        else:
+            line = json.dumps({'query': query, 'entry': entry}, ensure_ascii=False)
+            if self.fmt == 'json':
+                line = ('[\n' if self.count == 0 else ',\n') + line
+            else:
+                line += '\n'
+            self.out.write(line)
+        self.count += 1
+
+    def close(self):
+        if self.fmt == 'json':
+            self.out.write('\n]\n' if self.count else '[]\n')
+        self.out.flush()
+
+    @staticmethod
+    def tsv_row(query, entry):
+        cells = [query]
+        if entry is None:
+            cells += [''] * (len(TSV_COLUMNS) - 1)
+        else:
+            pron = entry.get('pronunciation') or {}
+            if isinstance(pron, str):
+                # zh entries: pinyin
+                pron = {'': pron}
+            cells += [entry.get('word', ''), pron.get('美', ''), pron.get('英', ''), pron.get('', ''),
+                      ' | '.join(entry.get('paraphrase') or [])]
+        return '\t'.join(' '.join(str(v).split()) for v in cells) + '\n'
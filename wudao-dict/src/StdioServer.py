@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+# Line-delimited JSON-RPC 2.0 on stdin/stdout for editor plugins (wd --stdio)
+#
+# The dictionary is opened in-process once, so a lookup does not start Python,
+# open a socket or read usr/ again. Methods:
+#   lookup    {"word": "hello", "fields": [...], "render": "short"|"long"}
+#             -> word info dict, plain text if render is given, or null
+#   batch     {"words": [...], "fields": [...], "render": ...} -> list of lookup results
+#   complete  {"prefix": "hel", "limit": 20} -> list of words
+#   $/cancelRequest  {"id": ...}   notification, a cancelled request is answered
+#                                  with error -32800 if it has not finished yet
+#   shutdown  -> null, then the process exits
+import json
+import queue
+import sys
+import threading
+
+from .CommandDraw import CommandDraw
+from .JsonReader import JsonReader
+from .JsonReader import EN_SHORT_FIELDS, ZH_SHORT_FIELDS
+from .tools import is_alphabet
+from .tools import LRUCache
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+REQUEST_CANCELLED = -32800
+
+
+class RpcError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+class StdioServer:
+    CACHE_LEN = 4096
+    MAX_BATCH = 1000
+    MAX_PREFIX_LIMIT = 200
+
+    def __init__(self, rfile=None, wfile=None):
+        self.rfile = rfile or sys.stdin.buffer
+        self.wfile = wfile or sys.stdout.buffer
+        self.json_reader = JsonReader()
+        self.painter = CommandDraw(False)
+        # (word, fields, render) -> result
+        self.cache = LRUCache(self.CACHE_LEN)
+        self.methods = {'lookup': self.lookup, 'batch': self.batch, 'complete': self.complete}
+        # requests run one at a time in the worker, the reader stays free for cancellations
+        self.queue = queue.Queue()
+        # ids (as json) of queued or running requests, and those of them cancelled
+        self.pending = set()
+        self.cancelled = set()
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+
+    def run(self):
+        worker = threading.Thread(target=self.work, daemon=True)
+        worker.start()
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                msg = json.loads(line.decode('utf-8'))
+            except ValueError as e:
+                self.send_error(None, PARSE_ERROR, 'Parse error: %s' % e)
+                continue
+            if not isinstance(msg, dict) or not isinstance(msg.get('method'), str):
+                # a notification is never answered, not even with an error
+                if not isinstance(msg, dict) or 'id' in msg:
+                    self.send_error(msg.get('id') if isinstance(msg, dict) else None,
+                                    INVALID_REQUEST, 'Invalid request')
+                continue
+            if msg['method'] == '$/cancelRequest':
+                params = msg.get('params')
+                if isinstance(params, dict) and 'id' in params:
+                    key = json.dumps(params['id'])
+                    with self.lock:
+                        if key in self.pending:
+                            self.cancelled.add(key)
+                continue
+            if 'id' in msg:
+                with self.lock:
+                    self.pending.add(json.dumps(msg['id']))
+            self.queue.put(msg)
+            if msg['method'] == 'shutdown':
+                break
+        # stdin closed or shutdown: answer what is queued, then stop
+        self.queue.put(None)
+        worker.join()
+
+    def work(self):
+        while True:
+            msg = self.queue.get()
+            if msg is None:
+                return
+            req_id = msg.get('id')
+            try:
+                if msg['method'] == 'shutdown':
+                    result = None
+                else:
+                    self.check_cancelled(req_id)
+                    method = self.methods.get(msg['method'])
+                    if method is None:
+                        raise RpcError(METHOD_NOT_FOUND, 'Method not found: %s' % msg['method'])
+                    params = msg.get('params', {})
+                    if not isinstance(params, dict):
+                        raise RpcError(INVALID_PARAMS, 'params must be an object')
+                    result = method(params, req_id)
+            except RpcError as e:
+                if 'id' in msg:
+                    self.send_error(req_id, e.code, str(e))
+            except (KeyError, TypeError, ValueError) as e:
+                if 'id' in msg:
+                    self.send_error(req_id, INVALID_PARAMS, 'Invalid params: %s' % e)
+            else:
+                # notifications get no reply, not even an error
+                if 'id' in msg:
+                    self.send({'jsonrpc': '2.0', 'id': req_id, 'result': result})
+            finally:
+                with self.lock:
+                    self.pending.discard(json.dumps(req_id))
+                    self.cancelled.discard(json.dumps(req_id))
+
+    def check_cancelled(self, req_id):
+        if self.cancelled and json.dumps(req_id) in self.cancelled:
+            raise RpcError(REQUEST_CANCELLED, 'Request cancelled')
+
+    def send(self, msg):
+        data = json.dumps(msg, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+        with self.write_lock:
+            self.wfile.write(data)
+            self.wfile.flush()
+
+    def send_error(self, req_id, code, message):
+        self.send({'jsonrpc': '2.0', 'id': req_id, 'error': {'code': code, 'message': message}})
+
+    def lookup(self, params, req_id=None):
+        return self.get_word(str(params['word']), params.get('fields'), params.get('render'))
+
+    def batch(self, params, req_id=None):
+        words = params['words']
+        if not isinstance(words, list) or len(words) > self.MAX_BATCH:
+            raise RpcError(INVALID_PARAMS, 'words must be a list (at most %d)' % self.MAX_BATCH)
+        results = []
+        for word in words:
+            self.check_cancelled(req_id)
+            results.append(self.get_word(str(word), params.get('fields'), params.get('render')))
+        return results
+
+    def complete(self, params, req_id=None):
+        prefix = str(params['prefix']).strip()
+        if not prefix:
+            return []
+        limit = max(1, min(int(params.get('limit', 20)), self.MAX_PREFIX_LIMIT))
+        zh = not is_alphabet(prefix[0])
+        return self.json_reader.get_prefix_words(prefix if zh else prefix.lower(), limit, zh)
+
+    # word info dict (only `fields` if given), rendered text if `render`, or None
+    def get_word(self, word, fields=None, render=None):
+        word = word.strip()
+        if not word:
+            return None
+        zh = not is_alphabet(word[0])
+        if not zh:
+            word = word.lower()
+        if render not in (None, 'short', 'long'):
+            raise RpcError(INVALID_PARAMS, "render must be 'short' or 'long'")
+        if render:
+            fields = None
+            if render == 'short':
+                fields = ZH_SHORT_FIELDS if zh else EN_SHORT_FIELDS
+        elif fields is not None:
+            # a string or dict would be taken apart into letters or keys
+            if not isinstance(fields, list) or not all(isinstance(v, str) for v in fields):
+                raise RpcError(INVALID_PARAMS, 'fields must be a list of strings')
+            fields = frozenset(fields)
+        key = (word, fields, render)
+        result = self.cache.get(key)
+        if result is not None:
+            return result
+        if zh:
+            result = self.json_reader.get_zh_word_dict(word, fields)
+        else:
+            result = self.json_reader.get_word_dict(word, fields)
+        if result is None:
+            return None
+        if render:
+            conf = {'short': render == 'short'}
+            if zh:
+                result = self.painter.render_zh_text(result, conf)
+            else:
+                result = self.painter.render_text(result, conf)
+        self.cache.put(key, result)
+        return result
@@ -8,39 +8,71 @@ class UserHistory:
     MAX_LATEST_LEN = 100
     MAX_CACHE_LEN = 10000
     MAX_COUNT_LEN = 50000
+    USR_DIR = './usr'
     content = {}
     conf = {}
-    latest_word = []
     DICT_FILE_NAME = './usr/usr_word.json'
     LATEST_FILE_NAME = './usr/latest.txt'
     ONLINE_CACHE = './usr/online_cache.json'
     NOTE_NAME = './usr/notebook.txt'
     CONF_NAME = './usr/conf.json'
 
-    def __init__(self):
-        # Create empty file
-        if not os.path.exists(self.DICT_FILE_NAME):
-            with open(self.DICT_FILE_NAME, 'w+') as f:
-                tmp_dict = {}
-                json.dump(tmp_dict, f)
-        if not os.path.exists(self.LATEST_FILE_NAME):
-            open(self.LATEST_FILE_NAME, 'w+').close()
-        if not os.path.exists(self.ONLINE_CACHE):
-            with open(self.ONLINE_CACHE, 'w+') as f:
-                json.dump({}, f)
+    # root: directory of the user's files, another user's namespace on a shared server
+    def __init__(self, root=None):
+        if root is not None:
+            self.USR_DIR = root
+            self.DICT_FILE_NAME = os.path.join(root, 'usr_word.json')
+            self.LATEST_FILE_NAME = os.path.join(root, 'latest.txt')
+            self.ONLINE_CACHE = os.path.join(root, 'online_cache.json')
+            self.NOTE_NAME = os.path.join(root, 'notebook.txt')
+            self.CONF_NAME = os.path.join(root, 'conf.json')
+            os.makedirs(root, exist_ok=True)
+        # Only the conf is read now, every run needs it. The history files
+        # are read on first use (most runs never touch the online cache),
+        # a missing one counts as empty and is created by the first write.
+        self.__latest_word = None
+        self.__word_co_map = None
+        self.__cache_dic = None
         if not os.path.exists(self.CONF_NAME):
             with open(self.CONF_NAME, 'w+') as f:
                 json.dump({"short": False, "save": True}, f)
-
-        # Load file
-        with open(self.LATEST_FILE_NAME, 'r') as f:
-            self.latest_word = [v.strip() for v in f.readlines()]
-        with open(self.ONLINE_CACHE, 'r') as f:
-            self.cache_dic = json.load(f)
-        with open(self.DICT_FILE_NAME, 'r') as f:
-            self.word_co_map = json.load(f)
         with open(self.CONF_NAME, 'r') as f:
             self.conf = json.load(f)
+
+    @staticmethod
+    def load_json(file_name):
+        try:
+            with open(file_name, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    @property
+    def latest_word(self):
+        if self.__latest_word is None:
+            try:
+                with open(self.LATEST_FILE_NAME, 'r') as f:
+                    self.__latest_word = [v.strip() for v in f.readlines()]
+            except FileNotFoundError:
+                self.__latest_word = []
+        return self.__latest_word
+
+    @property
+    def word_co_map(self):
+        if self.__word_co_map is None:
+            self.__word_co_map = self.load_json(self.DICT_FILE_NAME)
+        return self.__word_co_map
+
+    @property
+    def cache_dic(self):
+        if self.__cache_dic is None:
+            self.__cache_dic = self.load_json(self.ONLINE_CACHE)
+        return self.__cache_dic
+
+    @cache_dic.setter
+    def cache_dic(self, value):
+        self.__cache_dic = value
+
     # save conf
 
     def save_conf(self, conf):
@@ -77,7 +109,6 @@ class UserHistory:
         if len(self.cache_dic) > self.MAX_CACHE_LEN:
             # remove
             self.cache_dic = {}
-            os.remove(self.ONLINE_CACHE)
         with open(self.ONLINE_CACHE, 'w') as f:
             self.cache_dic[word_info['word'].lower()] = word_info
             json.dump(self.cache_dic, f)
@@ -94,7 +125,7 @@ class UserHistory:
         if word_struct['word'] in self.latest_word:
             return
         else:
-            with open('./usr/' + notename + '.txt', 'a+') as f:
+            with open(os.path.join(self.USR_DIR, notename + '.txt'), 'a+') as f:
                 space1 = ' '*(20 - len(word_struct['word'])) + ' '
                 pn = ''
                 if '' in word_struct['pronunciation']:
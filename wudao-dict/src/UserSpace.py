@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+# Per-user state of a shared WudaoServer: history, notebooks and online cache
+#
+# A client is identified by the uid of its Unix socket peer, or by a token
+# listed in ./usr/tokens.json ({"token": "name", ...}). Each one gets its
+# own directory ./usr/users/<uid or name>/, readable by the server's user
+# only (and owned by the uid when the server runs as root); the user running
+# the server uses ./usr itself, as before. Clients that are neither (TCP
+# without a token) can look words up, but nothing is recorded for them.
+import json
+import os
+import re
+import threading
+
+from .OnlineCache import OnlineCache
+from .UserHistory import UserHistory
+
+
+class UserSpace:
+    def __init__(self, root, online_cache=None):
+        self.root = root
+        self.history = UserHistory(root)
+        self.online_cache = online_cache or OnlineCache(os.path.join(root, 'online_cache.json'))
+        # UserHistory writes whole files, one writer at a time
+        self.lock = threading.Lock()
+
+    # record a looked up word like WudaoCommand does, note: notebook name or None
+    def track(self, meta, note=None):
+        with self.lock:
+            if note:
+                self.history.save_note(meta, note)
+            self.history.add_item(meta)
+
+
+class UserSpaces:
+    USERS_DIR = './usr/users'
+    TOKEN_FILE_NAME = './usr/tokens.json'
+    # token user names, never all digits so they cannot clash with uids
+    NAME_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_.-]{0,63}$')
+
+    def __init__(self, online_cache=None):
+        self.owner_uid = os.getuid() if hasattr(os, 'getuid') else None
+        self.default = UserSpace('./usr', online_cache)
+        self.__spaces = {}
+        self.__lock = threading.Lock()
+        self.__tokens = {}
+        try:
+            with open(self.TOKEN_FILE_NAME, 'r') as f:
+                tokens = json.load(f)
+            self.__tokens = {str(k): str(v) for k, v in tokens.items() if self.NAME_RE.fullmatch(str(v))}
+        except (OSError, ValueError, AttributeError):
+            pass
+
+    # True if the peer may run admin commands (shutdown, profiling): only the owner
+    # or root on the Unix socket, a TCP peer (uid None) may be anyone
+    def is_admin(self, uid):
+        return uid is not None and (uid == 0 or uid == self.owner_uid)
+
+    # True if `name` may name a notebook, usr/<name>.txt: no path of its own
+    @classmethod
+    def is_note_name(cls, name):
+        return isinstance(name, str) and bool(cls.NAME_RE.fullmatch(name)) and '..' not in name
+
+    # True if the client is known by its Unix socket uid or a listed token
+    def is_known(self, uid=None, token=None):
+        return uid is not None or (token is not None and str(token) in self.__tokens)
+
+    # space of a Unix socket peer uid and/or token, the default space if neither is known
+    def get(self, uid=None, token=None):
+        name = None
+        if token is not None:
+            name = self.__tokens.get(str(token))
+        if name is None and uid is not None and uid != self.owner_uid:
+            name = str(uid)
+        if name is None:
+            return self.default
+        with self.__lock:
+            space = self.__spaces.get(name)
+            if space is None:
+                root = os.path.join(self.USERS_DIR, name)
+                self.make_private_dir(root, uid if name == str(uid) else None)
+                space = self.__spaces[name] = UserSpace(root)
+            return space
+
+    # directory only its owner can read, owned by `uid` if the server may give it away (root)
+    def make_private_dir(self, path, uid=None):
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        os.chmod(path, 0o700)
+        if uid is not None and self.owner_uid == 0:
+            os.chown(path, uid, -1)
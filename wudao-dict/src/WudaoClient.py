@@ -1,44 +1,292 @@
 # -*- coding: utf-8 -*-
 
+import json
+import os
+import queue
 import socket
+import stat
+import threading
 import time
 
+from .protocol import KIND_JSON, KIND_RAW, KIND_ERROR, KIND_RENDER, KIND_BINARY
+from .protocol import encode_request, read_frame, decode_word
+from .protocol import ServerError
+from .protocol import ServerUnavailable
+from .tools import is_alphabet
+
 
 class WudaoClient:
-    def __init__(self):
+    UNIX_SOCKET_PATH = '/tmp/wudao-dict.sock'
+    # how long to wait for a server that is starting up
+    CONNECT_TIMEOUT = 5
+    # requests sent ahead of their replies by get_words_rendered
+    PIPELINE_WINDOW = 64
+
+    # timeout: seconds a send or reply may take, and the default wait for a server in
+    # connect(); None waits for replies forever (and CONNECT_TIMEOUT for a server)
+    def __init__(self, timeout=None):
         self.client = None
+        self.timeout = timeout
+        # a shared server tells users apart by uid (Unix socket) or by this token
+        self.token = os.environ.get('WUDAO_TOKEN')
 
-    def connect(self):
-        # waiting for server init
-        self.client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        beats = 0
+    # connect, waiting up to `wait` seconds (by default `timeout`, or CONNECT_TIMEOUT without
+    # one) for a starting server. The server binds its sockets before loading the dictionary,
+    # so once connect() succeeds requests simply queue until it can answer.
+    def connect(self, wait=None):
+        if wait is None:
+            wait = self.CONNECT_TIMEOUT if self.timeout is None else self.timeout
+        deadline = time.time() + wait
+        delay = 0.005
         while True:
+            self.client = self.try_connect()
+            if self.client:
+                self.client.settimeout(self.timeout)
+                return
+            if time.time() >= deadline:
+                raise ServerUnavailable('Error: Wudao server is not running (no answer on %s or 127.0.0.1:23764)'
+                                        % self.UNIX_SOCKET_PATH)
+            time.sleep(delay)
+            delay = min(delay * 2, 0.05)
+
+    # connected socket, or None if no server listens yet
+    def try_connect(self):
+        # the host's shared server, if there is one
+        sock = self.try_connect_unix()
+        if sock is not None:
+            return sock
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            sock.connect(("127.0.0.1", 23764))
+            # pipelined requests are small writes that must not wait for acks
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            return sock
+        except OSError:
+            sock.close()
+            return None
+
+    # True if the socket at `path` is a server's we may trust with our words: /tmp is
+    # anyone's, so it must belong to root, us, or the user who owns the dictionary (./dict)
+    @staticmethod
+    def is_trusted_socket(path):
+        try:
+            st = os.lstat(path)
+        except OSError:
+            return False
+        if not stat.S_ISSOCK(st.st_mode):
+            return False
+        owners = {0, os.getuid()}
+        try:
+            owners.add(os.stat('./dict').st_uid)
+        except OSError:
+            pass
+        return st.st_uid in owners
+
+    # socket connected to the server's Unix socket, or None
+    def try_connect_unix(self):
+        if not hasattr(socket, 'AF_UNIX') or not self.is_trusted_socket(self.UNIX_SOCKET_PATH):
+            return None
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.UNIX_SOCKET_PATH)
+            return sock
+        except OSError:
+            sock.close()
+            return None
+
+    # connect unless connected, waiting up to `wait` seconds like connect()
+    def ensure_connected(self, wait=None):
+        if self.client is None:
+            self.connect(wait)
+
+    # True if the server closed the idle connection (it restarted or exited)
+    def closed_by_server(self):
+        import select
+        try:
+            if not select.select([self.client], [], [], 0)[0]:
+                return False
+            return self.client.recv(1, socket.MSG_PEEK) == b''
+        except (OSError, ValueError):
+            return True
+
+    def disconnect(self):
+        if self.client:
+            self.client.close()
+            self.client = None
+
+    # send one framed request, return (kind, body); the connection is kept for the next one
+    def request(self, req):
+        reused = self.client is not None
+        if reused and 'track' in req and self.closed_by_server():
+            # it will not be retried, start it on a live connection
+            self.disconnect()
+            reused = False
+        if not reused:
+            self.connect()
+        if self.token:
+            req['token'] = self.token
+        try:
+            self.client.sendall(encode_request(req))
+            return read_frame(self.client)
+        except (ConnectionError, OSError) as e:
+            self.disconnect()
+            # server restarted since the last request, try a fresh connection once. Not after
+            # a timeout (the server may still answer it) or for track, it would count twice.
+            if not reused or isinstance(e, socket.timeout) or 'track' in req:
+                raise
+            return self.request(req)
+
+    # return dict of word info (only `fields` if given), or None
+    # binary: decoded entries (not raw records) come in the binary encoding instead of json
+    def get_word_dict(self, word, raw=True, fields=None, online=False, binary=False):
+        req = self.dict_request(word, raw, fields, online, binary)
+        return self.parse_dict(req['q'], fields, *self.request(req))
+
+    # (word, get_word_dict result) for each of `words`, pipelined like get_words_rendered
+    def get_words_dict(self, words, raw=True, fields=None, online=False, binary=False, window=None):
+        return self.pipeline(words, lambda word: self.dict_request(word, raw, fields, online, binary),
+                             lambda word, kind, body: self.parse_dict(word.lower(), fields, kind, body),
+                             window)
+
+    @staticmethod
+    def dict_request(word, raw=True, fields=None, online=False, binary=False):
+        req = {'q': word.lower(), 'raw': raw, 'online': online, 'bin': binary}
+        if fields is not None:
+            req['fields'] = sorted(fields)
+        return req
+
+    @staticmethod
+    def parse_dict(word, fields, kind, body):
+        if kind == KIND_RAW:
+            # not imported at the top, `wd word` only asks for rendered text
+            from .JsonReader import decode_en_record, decode_zh_record
+            if is_alphabet(word[0]):
+                return decode_en_record(body, fields)
+            return decode_zh_record(body, fields)
+        if kind == KIND_BINARY:
+            return decode_word(body)
+        if kind == KIND_JSON:
+            return json.loads(body.decode('utf-8'))
+        if kind == KIND_ERROR:
+            raise ServerError(body.decode('utf-8'))
+        return None
+
+    # return (meta dict, rendered terminal text as bytes), or None
+    # online: let the server search its online cache and Youdao on a miss
+    # track: let the server add the word to the user's history, {'note': name} also to that notebook;
+    #        meta['tracked'] is True if it did (it only does for users it can tell apart)
+    def get_word_rendered(self, word, short, color=True, online=False, track=None):
+        return self.parse_rendered(*self.request(self.render_request(word, short, color, online, track)))
+
+    # (word, get_word_rendered result) for each of `words` (any iterable, e.g. lines of a pipe), in order
+    def get_words_rendered(self, words, short, color=True, online=False, track=None, window=None):
+        return self.pipeline(words, lambda word: self.render_request(word, short, color, online, track),
+                             lambda word, kind, body: self.parse_rendered(kind, body), window)
+
+    # (word, parse(word, kind, body)) for the request make_request(word) of each word, in order.
+    # Up to `window` requests are in flight on the connection at once: a thread
+    # sends them as words come in, and replies are yielded as soon as they arrive.
+    def pipeline(self, words, make_request, parse, window=None):
+        if self.client is None:
+            self.connect()
+        sock = self.client
+        slots = threading.Semaphore(window or self.PIPELINE_WINDOW)
+        # words whose requests are sent, None once all are
+        sent = queue.Queue()
+        # what stopped the sender early (reading `words` or the connection failed)
+        errors = []
+
+        def send_all():
             try:
-                self.client.connect(("127.0.0.1", 23764))
-                break
-            except ConnectionRefusedError:
-                if beats >= 20:
-                    print('Error: Connection out of time')
+                for word in words:
+                    slots.acquire()
+                    req = make_request(word)
+                    if self.token:
+                        req['token'] = self.token
+                    sent.put(word)
+                    sock.sendall(encode_request(req))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                sent.put(None)
+
+        sender = threading.Thread(target=send_all, daemon=True)
+        sender.start()
+        try:
+            while True:
+                word = sent.get()
+                if word is None:
+                    if errors:
+                        raise errors[0]
                     break
-                time.sleep(0.2)
-                beats += 1
-
-    def get_word_info(self, word):
-        self.connect()
-        word = word.lower()
-        self.client.sendall(word.encode('utf-8'))
-        server_context = b''
-        while True:
-            rec = self.client.recv(512)
-            if not rec:
-                break
-            server_context += rec
-        server_context = server_context.decode('utf-8')
-        self.client.close()
-        return server_context
+                kind, body = read_frame(sock)
+                slots.release()
+                yield word, parse(word, kind, body)
+        except BaseException:
+            # replies in flight cannot be matched up any more
+            self.disconnect()
+            raise
+        sender.join()
+
+    @staticmethod
+    def render_request(word, short, color=True, online=False, track=None):
+        req = {'q': word.lower(), 'render': 'short' if short else 'long', 'color': color, 'online': online}
+        if track is not None:
+            req['track'] = track
+        return req
 
+    @staticmethod
+    def parse_rendered(kind, body):
+        if kind == KIND_RENDER:
+            meta, text = body.split(b'\n', 1)
+            return json.loads(meta.decode('utf-8')), text
+        if kind == KIND_ERROR:
+            raise ServerError(body.decode('utf-8'))
+        return None
+
+    # dictionary words starting with prefix, in lexical order
+    def get_prefix_words(self, prefix, limit=20):
+        return self.parse_prefix(*self.request({'prefix': prefix, 'limit': limit}))
+
+    @staticmethod
+    def parse_prefix(kind, body):
+        if kind == KIND_JSON:
+            return json.loads(body.decode('utf-8'))
+        if kind == KIND_ERROR:
+            raise ServerError(body.decode('utf-8'))
+        return []
+
+    # return json string of word info (only `fields` if given), or 'None'
+    def get_word_info(self, word, fields=None):
+        req = {'q': word.lower()}
+        if fields is not None:
+            req['fields'] = sorted(fields)
+        kind, body = self.request(req)
+        if kind == KIND_JSON:
+            return body.decode('utf-8')
+        return 'None'
+
+    # closes the connection only, the server keeps running
     def close(self):
-        self.connect()
-        if self.client:
-            self.client.sendall('---shutdown keyword---'.encode('utf-8'))
+        self.disconnect()
+
+    # ask the server to exit (only allowed for the user running it)
+    # over the Unix socket, the server knows its owner only there
+    def shutdown_server(self):
+        self.disconnect()
+        self.client = self.try_connect_unix()
+        if self.client is None:
+            print('Server is not running (no answer on %s).' % self.UNIX_SOCKET_PATH)
+            return
+        try:
+            self.client.sendall(encode_request({'cmd': 'shutdown'}))
+            kind, body = read_frame(self.client)
+        except (OSError, EOFError) as e:
+            print('Error: no answer from the server (%s)' % e)
+            return
+        finally:
+            self.disconnect()
+        if kind == KIND_ERROR:
+            print(body.decode('utf-8'))
+        else:
             print('Server closed!')
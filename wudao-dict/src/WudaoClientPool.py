@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+# Thread-safe pool of WudaoClient connections, the blocking counterpart of AsyncWudaoClient
+#
+#     pool = WudaoClientPool(max_connections=8)
+#     info = pool.get_word_dict('hello')          # from any thread
+#     with pool.client() as client:               # one connection for a series of requests
+#         client.get_word_rendered('hello', True)
+#
+# A thread waits for a free connection when all max_connections are in use. Requests
+# that fail on the connection or time out are retried `retries` times on a new one.
+import queue
+import socket
+import threading
+from contextlib import contextmanager
+
+from .WudaoClient import WudaoClient
+from .protocol import ServerUnavailable
+
+
+class WudaoClientPool:
+    def __init__(self, max_connections=8, timeout=5.0, retries=2):
+        self.timeout = timeout
+        self.retries = retries
+        self.__slots = threading.BoundedSemaphore(max_connections)
+        # idle clients, the last used first (its connection is the most likely to be alive)
+        self.__idle = queue.LifoQueue()
+
+    # a client for the calling thread only, returned to the pool at the end of the block
+    @contextmanager
+    def client(self):
+        if not self.__slots.acquire(timeout=self.timeout):
+            raise ServerUnavailable('Error: no free connection to the Wudao server after %s s' % self.timeout)
+        try:
+            try:
+                client = self.__idle.get_nowait()
+            except queue.Empty:
+                client = WudaoClient(self.timeout)
+            try:
+                yield client
+            except (OSError, EOFError):
+                # a reply may still be on its way, start over with a new connection
+                client.disconnect()
+                raise
+            finally:
+                self.__idle.put(client)
+        finally:
+            self.__slots.release()
+
+    # fn(client, *args) on a pooled client, retried on connection errors and timeouts
+    def call(self, fn, *args):
+        for attempt in range(self.retries + 1):
+            try:
+                with self.client() as client:
+                    return fn(client, *args)
+            except ServerUnavailable:
+                # connect() waited for a server already
+                raise
+            except (ConnectionError, socket.timeout, EOFError):
+                if attempt == self.retries:
+                    raise
+
+    # close all idle connections, the server keeps running
+    def close(self):
+        while True:
+            try:
+                self.__idle.get_nowait().disconnect()
+            except queue.Empty:
+                return
+
+    def get_word_dict(self, word, fields=None, online=False, raw=True):
+        return self.call(lambda client: client.get_word_dict(word, raw, fields, online))
+
+    def get_word_rendered(self, word, short, color=True, online=False, track=None):
+        if track is not None:
+            # not retried, it would be counted twice
+            with self.client() as client:
+                return client.get_word_rendered(word, short, color, online, track)
+        return self.call(lambda client: client.get_word_rendered(word, short, color, online))
+
+    def get_prefix_words(self, prefix, limit=20):
+        return self.call(lambda client: client.get_prefix_words(prefix, limit))
+
+    # get_word_dict of each word, in order, pipelined on one connection
+    def get_words_dict(self, words, fields=None, online=False, raw=True):
+        words = list(words)
+        return self.call(lambda client: [info for _, info in client.get_words_dict(words, raw, fields, online)])
+
+    def get_words_rendered(self, words, short, color=True, online=False):
+        words = list(words)
+        return self.call(lambda client: [r for _, r in client.get_words_rendered(words, short, color, online)])
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+# Local HTTP/JSON API on top of JsonReader
+#   GET  /v1/en/{word}[?fields=word,pronunciation,paraphrase]
+#   GET  /v1/zh/{word}[?fields=...]
+#   GET  /v1/prefix/{prefix}?limit=20
+#   POST /v1/batch          body: {"words": ["a", "b", ...]}
+import gzip
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit, parse_qs
+
+from .AccessLog import StageTimer
+from .Profiler import Profiler
+from .tools import is_alphabet
+from .tools import LRUCache
+from .tools import SingleFlight
+
+
+class WudaoHttpHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'Wudao/2.2'
+    disable_nagle_algorithm = True
+    MAX_BATCH = 1000
+    MAX_BODY = 1 << 20
+    MAX_PREFIX_LIMIT = 200
+    GZIP_MIN_LEN = 256
+
+    # every request is timed and handed to the server's access log
+    def do_GET(self):
+        self.timed(self.handle_get)
+
+    def do_POST(self):
+        self.timed(self.handle_post)
+
+    def timed(self, handler):
+        self.timer = StageTimer()
+        self.status, self.sent = 0, 0
+        self.server.begin_request()
+        try:
+            self.server.profiler.call(handler)
+        finally:
+            self.server.end_request()
+        self.timer.mark('send')
+        if self.server.access_log is not None:
+            self.server.access_log.log('http', self.path, self.status, self.sent, self.timer)
+
+    def handle_get(self):
+        url = urlsplit(self.path)
+        parts = url.path.split('/', 3)
+        if len(parts) != 4 or parts[1] != 'v1' or not parts[3]:
+            return self.send_error_json(404, 'not found')
+        kind, arg = parts[2], unquote(parts[3])
+        if kind == 'en' or kind == 'zh':
+            fields = parse_qs(url.query).get('fields')
+            if fields:
+                fields = frozenset(fields[0].split(','))
+            entry = self.server.get_entry(arg, kind == 'zh', fields or None)
+            self.timer.mark('lookup')
+            if entry is None:
+                return self.send_error_json(404, 'no such word')
+            return self.send_body(*entry)
+        if kind == 'prefix':
+            try:
+                limit = int(parse_qs(url.query).get('limit', ['20'])[0])
+            except ValueError:
+                return self.send_error_json(400, 'bad limit')
+            limit = max(1, min(limit, self.MAX_PREFIX_LIMIT))
+            words = self.server.json_reader.get_prefix_words(
+                arg.lower() if is_alphabet(arg[0]) else arg, limit, not is_alphabet(arg[0]))
+            self.timer.mark('lookup')
+            body = json.dumps({'prefix': arg, 'words': words}, ensure_ascii=False).encode('utf-8')
+            return self.send_body(body, None)
+        self.send_error_json(404, 'not found')
+
+    def handle_post(self):
+        if urlsplit(self.path).path != '/v1/batch':
+            return self.send_error_json(404, 'not found')
+        try:
+            length = int(self.headers.get('Content-Length', '0'))
+        except ValueError:
+            return self.send_error_json(400, 'bad length')
+        if length <= 0 or length > self.MAX_BODY:
+            return self.send_error_json(413 if length > 0 else 400, 'bad body size')
+        try:
+            req = json.loads(self.rfile.read(length).decode('utf-8'))
+            words = req['words'] if isinstance(req, dict) else req
+            if not isinstance(words, list) or len(words) > self.MAX_BATCH:
+                raise ValueError
+        except (ValueError, KeyError, TypeError):
+            return self.send_error_json(400, 'body must be {"words": [...]} (at most %d)' % self.MAX_BATCH)
+        results = []
+        for word in words:
+            word = str(word).strip()
+            info = None
+            if word:
+                info = self.server.get_word(word, not is_alphabet(word[0]))
+            results.append({'query': word, 'result': info})
+        self.timer.mark('lookup')
+        body = json.dumps({'results': results}, ensure_ascii=False).encode('utf-8')
+        self.send_body(body, None, cache=False)
+
+    # body: bytes, gz: pre-compressed body or None
+    def send_body(self, body, gz, status=200, cache=True):
+        use_gzip = 'gzip' in self.headers.get('Accept-Encoding', '') and len(body) >= self.GZIP_MIN_LEN
+        etag = None
+        if cache:
+            etag = '"%s-%s"' % (self.server.json_reader.build_id, 'gz' if use_gzip else 'id')
+            if etag in self.headers.get('If-None-Match', ''):
+                self.status = 304
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+        if use_gzip:
+            body = gz if gz is not None else gzip.compress(body, 6)
+        self.status, self.sent = status, len(body)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Vary', 'Accept-Encoding')
+        if use_gzip:
+            self.send_header('Content-Encoding', 'gzip')
+        if etag:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'public, max-age=%d' % self.server.max_age)
+        else:
+            self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status, msg):
+        body = json.dumps({'error': msg}).encode('utf-8')
+        self.status, self.sent = status, len(body)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    # per-request logging to stderr is far too slow for the hot path, see timed()
+    def log_message(self, format, *args):
+        pass
+
+
+class WudaoHttpServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+    CACHE_LEN = 4096
+
+    # begin_request/end_request: called around every request, e.g. WudaoServer's idle clock
+    def __init__(self, json_reader, address=('127.0.0.1', 23765), max_age=86400, access_log=None, profiler=None,
+                 begin_request=None, end_request=None):
+        self.json_reader = json_reader
+        self.begin_request = begin_request or (lambda: None)
+        self.end_request = end_request or (lambda: None)
+        self.access_log = access_log
+        self.profiler = profiler or Profiler()
+        self.max_age = max_age
+        # (zh, word, fields) -> (json bytes, gzip bytes)
+        self.cache = LRUCache(self.CACHE_LEN)
+        self.flight = SingleFlight()
+        super().__init__(address, WudaoHttpHandler)
+
+    def get_word(self, word, zh, fields=None):
+        if zh:
+            return self.json_reader.get_zh_word_dict(word, fields)
+        return self.json_reader.get_word_dict(word.lower(), fields)
+
+    # encoded entry, or None if the word does not exist
+    def get_entry(self, word, zh, fields=None):
+        if not zh:
+            word = word.lower()
+        key = (zh, word, fields)
+        entry = self.cache.get(key)
+        if entry is None:
+            entry = self.flight.do(key, self.encode_entry, word, zh, fields)
+        return entry
+
+    def encode_entry(self, word, zh, fields):
+        info = self.get_word(word, zh, fields)
+        if info is None:
+            return None
+        body = json.dumps(info, ensure_ascii=False).encode('utf-8')
+        entry = (body, gzip.compress(body, 6))
+        self.cache.put((zh, word, fields), entry)
+        return entry
@@ -1 +1 @@
-__all__ = ["CommandDraw", "JsonReader", "UserHistory", "WudaoClient"]
+__all__ = ["CommandDraw", "JsonReader", "UserHistory", "WudaoClient", "WudaoClientPool", "AsyncWudaoClient"]
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+# wd --export-notebook anki|csv [NOTEBOOK]: a notebook as flashcards
+#
+# Notebook lines (see UserHistory.save_note) keep only the word, one pronunciation and
+# the paraphrases, so every word is looked up again: all of them in one pass, in the
+# order of their records in the data file, which reads it front to back once. Words
+# the dictionary does not have (found online) keep what their notebook line has.
+#   csv   word, pronunciation, paraphrase, examples; one paraphrase or example per line of a cell
+#   anki  tab separated text for Anki's File > Import: the word on the front, pronunciation,
+#         paraphrases and examples (html) on the back
+import csv
+import html
+import os
+
+FORMATS = ('anki', 'csv')
+# words are padded to this width in notebook lines
+NOTE_WORD_WIDTH = 20
+
+
+# (field, rest) of a padded notebook column: the field ends at the padding, or for longer
+# ones at the first space after NOTE_WORD_WIDTH (a long phrase is cut at a space there)
+def split_note_field(text):
+    end = text.find(' ', NOTE_WORD_WIDTH)
+    if end < 0:
+        return text.strip(), ''
+    return text[:end].strip(), text[end + 1:]
+
+
+# (word, rest) of a notebook line. A word shorter than NOTE_WORD_WIDTH is padded, so
+# split_note_field finds its end. A longer phrase is followed by one space only: it is the
+# longest prefix the dictionary `index` has that ends at a space between NOTE_WORD_WIDTH and
+# the padding (the first double space or tab), so only those few prefixes are looked up;
+# split_note_field again if there is none (a phrase found online).
+def split_note_word(line, index=None):
+    pad = min(p for p in (line.find('  '), line.find('\t'), len(line)) if p >= 0)
+    if index is not None and pad >= NOTE_WORD_WIDTH:
+        end = None
+        pos = line.find(' ', NOTE_WORD_WIDTH, pad + 1)
+        while pos > 0:
+            if index.get(line[:pos].lower()) is not None:
+                end = pos
+            pos = line.find(' ', pos + 1, pad + 1)
+        if end is not None:
+            return line[:end], line[end + 1:]
+    return split_note_field(line)
+
+
+# notebook line -> (word, pronunciation, paraphrase), None for blank lines
+def parse_note_line(line, index=None):
+    line = line.rstrip('\n')
+    if not line.strip():
+        return None
+    word, rest = split_note_word(line, index)
+    pron, rest = split_note_field(rest)
+    return word, pron, rest.strip()
+
+
+# [(word, pronunciation, paraphrase)] of a notebook file, each word once, in notebook order
+# index: the dictionary's, to tell long phrases from what follows them
+def read_notebook(file_name, index=None):
+    notes = []
+    seen = set()
+    with open(file_name, 'r', encoding='utf-8') as f:
+        for line in f:
+            note = parse_note_line(line, index)
+            if note is None or note[0].lower() in seen:
+                continue
+            seen.add(note[0].lower())
+            notes.append(note)
+    return notes
+
+
+# {word: entry} of all words the dictionary has, looked up in record order
+def lookup_all(reader, words):
+    index = reader.index_dict
+    located = []
+    for word in words:
+        entry = index.get(word.lower())
+        if entry is not None:
+            located.append((entry[0], word))
+    located.sort()
+    entries = {}
+    for _, word in located:
+        entries[word] = reader.get_word_dict(word.lower())
+    return entries
+
+
+def pronunciation_text(pron):
+    if isinstance(pron, str):
+        return pron
+    if '' in pron:
+        return pron['']
+    return '  '.join('%s %s' % (k, pron[k]) for k in ('英', '美') if k in pron)
+
+
+# example sentences of an entry as (english, chinese), both sentence formats CommandDraw knows
+def examples(entry):
+    res = []
+    for v in entry.get('sentence') or []:
+        if len(v) == 3 and isinstance(v[2], list):
+            # collins: meaning, type, examples
+            res += [(sv[0].strip(), sv[1].strip()) for sv in v[2] if len(sv) == 2]
+        elif len(v) == 2 and isinstance(v[0], str):
+            res.append((v[0].strip(), v[1].strip()))
+    return res
+
+
+# (word, pronunciation, [paraphrase], [(english, chinese)]) of a notebook word
+def card(note, entry):
+    word, pron, paraphrase = note
+    if entry is None:
+        return word, pron, [paraphrase] if paraphrase else [], []
+    return (entry['word'], pronunciation_text(entry['pronunciation']) or pron,
+            entry.get('paraphrase') or [], examples(entry))
+
+
+def write_csv(f, cards):
+    writer = csv.writer(f)
+    writer.writerow(('word', 'pronunciation', 'paraphrase', 'examples'))
+    for word, pron, paraphrase, sentences in cards:
+        writer.writerow((word, pron, '\n'.join(paraphrase), '\n'.join(en + ' ' + zh for en, zh in sentences)))
+
+
+def write_anki(f, cards):
+    f.write('#separator:tab\n#html:true\n#columns:Front\tBack\n')
+    for word, pron, paraphrase, sentences in cards:
+        back = []
+        if pron:
+            back.append('<i>%s</i>' % html.escape(pron))
+        back += [html.escape(v) for v in paraphrase]
+        if sentences:
+            back.append('')
+            back += ['%s<br><small>%s</small>' % (html.escape(en), html.escape(zh)) for en, zh in sentences]
+        # a tab or line break would end the field or the note
+        fields = (html.escape(word), '<br>'.join(back))
+        f.write('\t'.join(' '.join(v.split()) for v in fields) + '\n')
+
+
+# write the notebook `file_name` as fmt to out_name, -> (number of cards, found in the dictionary)
+def export_notebook(reader, file_name, fmt, out_name):
+    if fmt not in FORMATS:
+        raise ValueError('Unknown export format: %s (one of %s)' % (fmt, ', '.join(FORMATS)))
+    notes = read_notebook(file_name, reader.index_dict)
+    entries = lookup_all(reader, [note[0] for note in notes])
+    cards = [card(note, entries.get(note[0])) for note in notes]
+    with open(out_name + '.tmp', 'w', encoding='utf-8', newline='') as f:
+        if fmt == 'csv':
+            write_csv(f, cards)
+        else:
+            write_anki(f, cards)
+    os.replace(out_name + '.tmp', out_name)
+    return len(cards), len(entries)
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+# Framed protocol between WudaoServer and its clients
+#
+# The legacy protocol (send the word, read until the server closes) still works.
+# A framed request is one JSON object per line, for example
+#     {"q": "hello", "raw": true}
+# and every response is a 5 byte header (kind, body length) followed by the body.
+# Any number of requests can be sent on one connection, also before the replies
+# to earlier ones have arrived (pipelined); replies come in request order.
+#
+# Request keys:
+#   q       word to look up
+#   raw     client can decode compressed dictionary records itself
+#   render  'short' or 'long': reply with the terminal text CommandDraw would print
+#   color   with render: keep the ANSI colours (default true)
+#   fields  list of fields to decode and send, e.g. ["word", "pronunciation", "paraphrase"]
+#   online  search the server's online cache and then Youdao if the word is not in the dictionary
+#   bin     reply with the compact binary encoding (KIND_BINARY) instead of json text
+#   track   with render: add the word to the user's history, {"note": name} also to that notebook;
+#           the reply's meta has "tracked": true if it was (only for users the server knows)
+#   prefix  instead of q: reply with a json list of dictionary words starting with it,
+#           "limit" of them at most (default 20, up to 200)
+#   token   names the user on a shared server (see src/UserSpace.py), Unix socket peers
+#           are known by their uid without one
+#   cmd     admin command instead of a lookup, only for the user running the server:
+#             'shutdown'
+#             'profile'  start a profiler session ("mode": "sample" or "cprofile"),
+#                        or stop the running one and reply {"file": ...} (written to usr/)
+#             'stacks'   write the stacks of all threads to usr/, reply {"file": ...}
+import json
+import struct
+
+HEADER = struct.Struct('!cI')
+MAX_REQUEST_LEN = 64 * 1024
+
+# response kinds
+KIND_JSON = b'J'    # utf-8 json word info
+KIND_RAW = b'Z'     # compressed record as stored in en.z/zh.z (hot region only if fields allow)
+KIND_NONE = b'N'    # no such word
+KIND_ERROR = b'E'   # utf-8 error message
+KIND_RENDER = b'R'  # json line {word, pronunciation, paraphrase} + rendered terminal text
+KIND_BINARY = b'B'  # word info in the binary encoding below
+
+# Binary encoding of a word info dict
+#
+# varint(len(shape)) + shape + utf-8 text of all strings, in order.
+# Every value in the shape starts with one byte: 2 bits type, 6 bits size.
+# A size of 63 means the real size follows as a varint (size - 63).
+#   string        size is its length in characters, the characters are taken from the text
+#   list, dict    size is the number of items
+#   string list   (list holding only strings) size heads of its strings follow
+# Dict keys are one byte: a tag for the known keys, or 0 followed by a string value.
+# The text is decoded in one go, so strings are slices and not one decode each.
+T_STR, T_LIST, T_DICT, T_STRS = 0x00, 0x40, 0x80, 0xc0
+KEY_TAGS = ('word', 'id', 'pronunciation', 'paraphrase', 'rank', 'pattern',
+            'sentence', 'desc', '美', '英', '')
+TAG_OF_KEY = {k: i + 1 for i, k in enumerate(KEY_TAGS)}
+KEY_OF_TAG = (None,) + KEY_TAGS
+
+# error reply from the server, the message is meant for the user
+class ServerError(Exception):
+    pass
+
+
+# no server answered in time, the message is meant for the user
+class ServerUnavailable(ConnectionError):
+    pass
+
+
+def _put_head(out, t, n):
+    if n < 63:
+        out.append(t | n)
+        return
+    out.append(t | 63)
+    n -= 63
+    while n >= 0x80:
+        out.append(n & 0x7f | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+# -> (size, new pos)
+def _get_size(data, pos, n):
+    shift = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        n += (b & 0x7f) << shift
+        if b < 0x80:
+            return n, pos
+        shift += 7
+
+
+def _put_value(shape, text, v):
+    if isinstance(v, str):
+        _put_head(shape, T_STR, len(v))
+        text.append(v)
+    elif isinstance(v, dict):
+        _put_head(shape, T_DICT, len(v))
+        for k, item in v.items():
+            tag = TAG_OF_KEY.get(k)
+            if tag:
+                shape.append(tag)
+            else:
+                shape.append(0)
+                _put_value(shape, text, k)
+            _put_value(shape, text, item)
+    elif isinstance(v, (list, tuple)):
+        if v and all(isinstance(item, str) for item in v):
+            _put_head(shape, T_STRS, len(v))
+            for item in v:
+                _put_head(shape, T_STR, len(item))
+            text.extend(v)
+            return
+        _put_head(shape, T_LIST, len(v))
+        for item in v:
+            _put_value(shape, text, item)
+    else:
+        # online results may hold numbers, keep them as text
+        _put_value(shape, text, str(v))
+
+
+def encode_word(word_info):
+    shape = bytearray()
+    text = []
+    _put_value(shape, text, word_info)
+    out = bytearray()
+    _put_head(out, 0, len(shape))
+    return bytes(out + shape) + ''.join(text).encode('utf-8')
+
+
+# inverse of encode_word, gives the same dict shape as json.loads
+def decode_word(body):
+    data = bytes(body)
+    pos = 1
+    n = data[0] & 63
+    if n == 63:
+        n, pos = _get_size(data, pos, n)
+    text = data[pos + n:].decode('utf-8')
+    tpos = 0
+
+    def value():
+        nonlocal pos, tpos
+        head = data[pos]
+        pos += 1
+        n = head & 63
+        if n == 63:
+            n, pos = _get_size(data, pos, n)
+        if head < T_LIST:
+            tpos += n
+            return text[tpos - n:tpos]
+        if head < T_DICT:
+            return [value() for _ in range(n)]
+        if head >= T_STRS:
+            strs = []
+            for _ in range(n):
+                m = data[pos]
+                pos += 1
+                if m == 63:
+                    m, pos = _get_size(data, pos, m)
+                strs.append(text[tpos:tpos + m])
+                tpos += m
+            return strs
+        d = {}
+        for _ in range(n):
+            tag = data[pos]
+            pos += 1
+            key = KEY_OF_TAG[tag] if tag else value()
+            d[key] = value()
+        return d
+
+    return value()
+
+
+def encode_request(req):
+    return json.dumps(req, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+# body may be any bytes-like object, e.g. a memoryview of the dictionary mmap
+def send_frame(sock, kind, body=b''):
+    header = HEADER.pack(kind, len(body))
+    if len(body) < 4096:
+        sock.sendall(header + bytes(body))
+        return
+    # gather write, the body is never copied into a new buffer
+    sent = sock.sendmsg([header, body])
+    if sent < len(header):
+        sock.sendall(header[sent:])
+        sent = len(header)
+    if sent < len(header) + len(body):
+        sock.sendall(memoryview(body)[sent - len(header):])
+
+
+def recv_exact(sock, n):
+    buf = bytearray(n)
+    view = memoryview(buf)
+    pos = 0
+    while pos < n:
+        got = sock.recv_into(view[pos:])
+        if not got:
+            raise ConnectionError('Connection closed by server')
+        pos += got
+    return bytes(buf)
+
+
+# return (kind, body)
+def read_frame(sock):
+    kind, length = HEADER.unpack(recv_exact(sock, HEADER.size))
+    return kind, recv_exact(sock, length) if length else b''
@@ -1,13 +1,23 @@
 # global functions
-from urllib.request import urlopen
-from urllib.parse import urlparse
-from urllib.parse import quote
+# Every `wd` run imports this module: urllib.request (which pulls in http.client
+# and email) and concurrent.futures are imported by the functions using them.
+from collections import OrderedDict
 import os
-import urllib.error
+import threading
+import time
 
 mon_ip = '119.28.128.77'
 
+# last known report server ip, without network access
+def get_cached_ip():
+    if os.path.exists('./IP'):
+        with open('./IP', 'r') as f:
+            return f.read().strip()
+    return mon_ip
+
+
 def get_ip():
+    from urllib.request import urlopen
     if ie():
         try:
             res = urlopen('https://chestnutheng.cn/IP', timeout=1)
@@ -30,6 +40,8 @@ def get_ip():
             
     
 def ie():
+    from urllib.request import urlopen
+    import urllib.error
     try:
         urlopen('http://www.baidu.com', timeout=1)
         return True
@@ -37,6 +49,8 @@ def ie():
         return False
 
 def report_new_word(x, ip):
+    from urllib.request import urlopen
+    from urllib.parse import urlparse, quote
     x = quote(x)
     url = urlparse('https://' + ip + '/wudao/add_new_word/' + x)
     res = urlopen(url.geturl(), timeout=1)
@@ -44,17 +58,123 @@ def report_new_word(x, ip):
     return xml
     
 def report_old_word(x, ip):
+    from urllib.request import urlopen
+    from urllib.parse import urlparse, quote
     x = quote(x)
     url = urlparse('https://' + ip + '/wudao/add_old_word/' + x)
     res = urlopen(url.geturl(), timeout=1)
     xml = res.read().decode('utf-8')
     return xml
     
+# most frequent words first, from the bash completion list in wd_com
+def get_common_words(path='./wd_com'):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+    except OSError:
+        return []
+    start = text.find('optl="')
+    if start < 0:
+        return []
+    start += len('optl="')
+    end = text.find('"', start)
+    return [v.strip() for v in text[start:end].split('\n') if v.strip()]
+
 def is_alphabet(uchar):
     if (u'\u0041' <= uchar <= u'\u005a') or \
             (u'\u0061' <= uchar <= u'\u007a') or uchar == '\'':
         return True
     else:
         return False
-        
-        
+
+
+# thread-safe LRU cache
+class LRUCache:
+    def __init__(self, max_len=1024):
+        self.max_len = max_len
+        self.__data = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.__lock:
+            try:
+                self.__data.move_to_end(key)
+                return self.__data[key]
+            except KeyError:
+                return default
+
+    def put(self, key, value):
+        with self.__lock:
+            self.__data[key] = value
+            self.__data.move_to_end(key)
+            if len(self.__data) > self.max_len:
+                self.__data.popitem(last=False)
+
+    def clear(self):
+        with self.__lock:
+            self.__data.clear()
+
+    def __len__(self):
+        return len(self.__data)
+
+
+# value of a slow function (e.g. one doing network I/O), computed on first use in a
+# background thread and recomputed after ttl seconds; get() never blocks and
+# returns the last value, or default before the first computation has finished
+class LazyValue:
+    def __init__(self, fn, ttl, default=None):
+        self.fn = fn
+        self.ttl = ttl
+        self.value = default
+        self.expires = 0
+        self.__refreshing = False
+        self.__lock = threading.Lock()
+
+    def get(self):
+        with self.__lock:
+            stale = time.time() >= self.expires and not self.__refreshing
+            if stale:
+                self.__refreshing = True
+        if stale:
+            threading.Thread(target=self.__refresh, daemon=True).start()
+        return self.value
+
+    def __refresh(self):
+        try:
+            self.value = self.fn()
+        except Exception:
+            pass
+        finally:
+            with self.__lock:
+                self.expires = time.time() + self.ttl
+                self.__refreshing = False
+
+
+# concurrent calls with the same key share one execution and its result
+class SingleFlight:
+    def __init__(self):
+        from concurrent.futures import Future
+        self.__future = Future
+        self.__calls = {}
+        self.__lock = threading.Lock()
+
+    def do(self, key, fn, *args):
+        with self.__lock:
+            future = self.__calls.get(key)
+            leader = future is None
+            if leader:
+                future = self.__future()
+                self.__calls[key] = future
+        if not leader:
+            return future.result()
+        try:
+            result = fn(*args)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self.__lock:
+                del self.__calls[key]
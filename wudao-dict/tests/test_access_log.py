@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+# Which request records go to access.log and slow.log
+# Usage: python3 -m unittest discover tests   (in the wudao-dict directory)
+import json
+import os
+import tempfile
+import unittest
+
+from src.AccessLog import AccessLog, StageTimer
+
+
+class AccessLogTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        tmp = self.tmp.name
+
+        class TmpAccessLog(AccessLog):
+            ACCESS_FILE_NAME = os.path.join(tmp, 'access.log')
+            SLOW_FILE_NAME = os.path.join(tmp, 'slow.log')
+        self.log_class = TmpAccessLog
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read(self, name):
+        try:
+            with open(name, 'r', encoding='utf-8') as f:
+                return [json.loads(line) for line in f]
+        except FileNotFoundError:
+            return []
+
+    def run_requests(self, sample, ms_list):
+        log = self.log_class(sample, slow_ms=50)
+        for i, ms in enumerate(ms_list):
+            timer = StageTimer()
+            timer.last = timer.start + ms / 1000
+            log.log('framed', 'w%d' % i, 'R', 10, timer)
+        log.close()
+        return self.read(log.ACCESS_FILE_NAME), self.read(log.SLOW_FILE_NAME)
+
+    def test_slow_not_sampled(self):
+        # sampled with a chance of 1e-9: slow requests are still not in access.log
+        access, slow = self.run_requests(1e-9, [1, 80, 120])
+        self.assertEqual(access, [])
+        self.assertEqual([r['q'] for r in slow], ['w1', 'w2'])
+
+    def test_all_sampled(self):
+        access, slow = self.run_requests(1.0, [1, 80])
+        self.assertEqual([r['q'] for r in access], ['w0', 'w1'])
+        self.assertEqual([r['q'] for r in slow], ['w1'])
+
+
+if __name__ == '__main__':
+    unittest.main()
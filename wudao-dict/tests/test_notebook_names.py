@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+# Notebook names in track requests must not reach outside the user's directory
+# Usage: python3 -m unittest discover tests   (in the wudao-dict directory)
+import os
+import unittest
+
+from WudaoServer import WudaoServer
+from src.AccessLog import StageTimer
+from src.UserSpace import UserSpaces
+from src.protocol import KIND_ERROR
+
+
+class NotebookNameTest(unittest.TestCase):
+    BAD_NAMES = ['/tmp/pwned', '../notebook', 'a/b', 'a..b', '..', '.hidden', '', 'note\n', 'my notes', 5, ['x']]
+
+    def test_is_note_name(self):
+        for name in ('notebook', 'words_2024', 'gre-list', 'A.b'):
+            self.assertTrue(UserSpaces.is_note_name(name), name)
+        for name in self.BAD_NAMES:
+            self.assertFalse(UserSpaces.is_note_name(name), name)
+
+    def test_track_request_rejected(self):
+        # answered before the dictionary or the user's files are touched
+        server = WudaoServer.__new__(WudaoServer)
+        for name in self.BAD_NAMES:
+            req = {'q': 'hello', 'render': 'short', 'track': {'note': name}}
+            kind, body = server.dispatch(req, StageTimer(), os.getuid())
+            self.assertEqual(kind, KIND_ERROR, name)
+
+
+if __name__ == '__main__':
+    unittest.main()